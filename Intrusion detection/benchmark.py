@@ -0,0 +1,183 @@
+
+import argparse
+import json
+import os
+import platform
+import random
+import subprocess
+import time
+import tracemalloc
+
+from cids import DetectorRegistry
+from detector_bank import DetectorBank
+import sweep
+
+# Benchmark suite: detector throughput and per-batch latency at 1, 100 and
+# 1,000 IDs, time-to-detection per attack type, and peak memory. Results are
+# written as JSON so two versions can be compared with --compare.
+
+ID_COUNTS = (1, 100, 1000)
+FRAMES_PER_ID = 2000
+DETECTION_RUNS = 5
+RESULTS_DIR = "bench_results"
+
+def synthetic_traffic(n_ids, frames_per_id, seed=0):
+    """Interleaved (arb_id, timestamp) arrivals of n_ids 50ms IDs with jitter"""
+    rng = random.Random(seed)
+    clocks = [rng.uniform(0, 0.05) for _ in range(n_ids)]
+    frames = []
+    for _ in range(frames_per_id):
+        for arb_id in range(n_ids):
+            clocks[arb_id] += 0.05 + rng.uniform(-0.00005, 0.00005)
+            frames.append((0x100 + arb_id, clocks[arb_id]))
+    frames.sort(key=lambda f: f[1])
+    return frames
+
+def percentiles(samples_ns, qs=(50, 90, 99, 99.9)):
+    samples = sorted(samples_ns)
+    if not samples:
+        return {}
+    out = {f"p{q}": samples[min(len(samples) - 1, int(len(samples) * q / 100))] / 1000 for q in qs}
+    out["max"] = samples[-1] / 1000
+    return out  # microseconds
+
+def bench_registry(frames):
+    registry = DetectorRegistry()
+    perf_ns = time.perf_counter_ns
+    latencies = []
+
+    start = perf_ns()
+    for arb_id, t in frames:
+        ids = registry.get(arb_id)
+        t0 = perf_ns()
+        result = ids.add_frame(t)
+        if result is not None:
+            latencies.append(perf_ns() - t0)
+    elapsed = (perf_ns() - start) / 1e9
+
+    return {
+        "frames_per_sec": len(frames) / elapsed,
+        "batches": len(latencies),
+        "batch_latency_us": percentiles(latencies),
+    }
+
+def bench_bank(frames, tick_every=1024):
+    bank = DetectorBank()
+    perf_ns = time.perf_counter_ns
+    tick_latencies = []
+    batches = 0
+
+    start = perf_ns()
+    for i, (arb_id, t) in enumerate(frames, 1):
+        bank.add_frame(arb_id, t)
+        if i % tick_every == 0:
+            t0 = perf_ns()
+            batches += len(bank.tick()[0])
+            tick_latencies.append(perf_ns() - t0)
+    batches += len(bank.tick()[0])
+    elapsed = (perf_ns() - start) / 1e9
+
+    return {
+        "frames_per_sec": len(frames) / elapsed,
+        "batches": batches,
+        "tick_latency_us": percentiles(tick_latencies),
+    }
+
+def peak_memory(fn, frames):
+    tracemalloc.start()
+    fn(frames)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak
+
+def bench_throughput(id_counts=ID_COUNTS, frames_per_id=FRAMES_PER_ID):
+    results = {}
+    for n_ids in id_counts:
+        frames = synthetic_traffic(n_ids, max(frames_per_id // max(1, n_ids // 100), 200))
+        registry = bench_registry(frames)
+        bank = bench_bank(frames)
+        registry["peak_memory_bytes"] = peak_memory(bench_registry, frames)
+        bank["peak_memory_bytes"] = peak_memory(bench_bank, frames)
+        results[str(n_ids)] = {"frames": len(frames), "registry": registry, "bank": bank}
+        print(f"{n_ids:5d} IDs: registry {registry['frames_per_sec']:10.0f} frames/s "
+              f"(p99 batch {registry['batch_latency_us'].get('p99', 0):.1f} us) | "
+              f"bank {bank['frames_per_sec']:10.0f} frames/s")
+    return results
+
+def bench_detection(runs=DETECTION_RUNS, seed=0):
+    """Time-to-detection of the paper scenarios with default parameters"""
+    params = {k: v[0] for k, v in sweep.DEFAULT_GRID.items()}
+    tasks = sweep.build_tasks({k: [v] for k, v in params.items()}, sweep.ATTACK_TYPES, runs, seed)
+    rows = [row for task in tasks for row in sweep.run_task(task)]  # One row per threshold
+
+    results = {}
+    for attack_type in sweep.ATTACK_TYPES:
+        attack_rows = [r for r in rows if r["attack"] == attack_type]
+        detected = [r for r in attack_rows if r["detected"]]
+        delays = sorted(r["detection_delay"] for r in detected)
+        delays_batches = sorted(r["detection_delay_batches"] for r in detected)
+        results[attack_type] = {
+            "runs": len(attack_rows),
+            "detection_rate": len(detected) / len(attack_rows),
+            "median_delay_sec": delays[len(delays) // 2] if delays else None,
+            "median_delay_batches": int(delays_batches[len(delays_batches) // 2]) if delays else None,
+        }
+        print(f"{attack_type:12s}: detected {len(detected)}/{len(attack_rows)}, "
+              f"median delay {results[attack_type]['median_delay_batches']} batches")
+    return results
+
+def git_revision():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"],
+                                       stderr=subprocess.DEVNULL, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def compare(old, new):
+    """Prints the throughput change of every configuration"""
+    for n_ids, entry in new["throughput"].items():
+        old_entry = old.get("throughput", {}).get(n_ids)
+        if not old_entry:
+            continue
+        for engine in ("registry", "bank"):
+            before = old_entry[engine]["frames_per_sec"]
+            after = entry[engine]["frames_per_sec"]
+            change = (after - before) / before * 100
+            flag = "  <-- regression" if change < -10 else ""
+            print(f"{n_ids:>5} IDs {engine:8s}: {before:10.0f} -> {after:10.0f} frames/s ({change:+.1f}%){flag}")
+
+def main():
+    parser = argparse.ArgumentParser(description="CIDS throughput, latency and detection benchmark")
+    parser.add_argument("--ids", nargs="+", type=int, default=list(ID_COUNTS))
+    parser.add_argument("--frames-per-id", type=int, default=FRAMES_PER_ID)
+    parser.add_argument("--runs", type=int, default=DETECTION_RUNS, help="runs per attack type")
+    parser.add_argument("--output-dir", default=RESULTS_DIR)
+    parser.add_argument("--compare", help="earlier result file to compare against")
+    args = parser.parse_args()
+
+    print("--- Detector throughput ---")
+    throughput = bench_throughput(args.ids, args.frames_per_id)
+    print("--- Time to detection ---")
+    detection = bench_detection(args.runs)
+
+    results = {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "git_revision": git_revision(),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "throughput": throughput,
+        "detection": detection,
+    }
+
+    os.makedirs(args.output_dir, exist_ok=True)
+    filename = os.path.join(args.output_dir, f"benchmark_{time.strftime('%Y%m%d_%H%M%S')}.json")
+    with open(filename, "w") as f:
+        json.dump(results, f, indent=2)
+    print(f"✅ Saved {filename}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            compare(json.load(f), results)
+
+if __name__ == "__main__":
+    main()
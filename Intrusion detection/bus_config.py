@@ -1,11 +1,51 @@
-import can
+import os
 
 
+# Defaults can be overridden with CIDS_BUS_INTERFACE / CIDS_BUS_CHANNEL
+# or the --interface / --channel command line options
 BUS_CONFIG = {
-    'interface': 'udp_multicast',
-    'channel': '239.255.1.1',
+    'interface': os.environ.get('CIDS_BUS_INTERFACE', 'udp_multicast'),
+    'channel': os.environ.get('CIDS_BUS_CHANNEL', '239.255.1.1'),
 }
 
-def get_bus():
-    print(f"🔌 Connecting to bus: {BUS_CONFIG['interface']}...")
-    return can.Bus(**BUS_CONFIG)
\ No newline at end of file
+# SocketCAN virtual interface for local load tests:
+#   sudo modprobe vcan
+#   sudo ip link add dev vcan0 type vcan && sudo ip link set up vcan0
+VCAN_CONFIG = {
+    'interface': 'socketcan',
+    'channel': 'vcan0',
+}
+
+def id_filters(arb_ids):
+    """Receive filters for exactly these IDs (applied in the kernel on SocketCAN)"""
+    filters = []
+    for arb_id in sorted(arb_ids):
+        extended = arb_id > 0x7FF
+        filters.append({
+            'can_id': arb_id,
+            'can_mask': 0x1FFFFFFF if extended else 0x7FF,
+            'extended': extended,
+        })
+    return filters
+
+def add_bus_arguments(parser):
+    parser.add_argument("--interface", help=f"python-can interface (default: {BUS_CONFIG['interface']})")
+    parser.add_argument("--channel", help=f"bus channel (default: {BUS_CONFIG['channel']})")
+    parser.add_argument("--vcan", action="store_true", help="use the SocketCAN vcan0 interface")
+
+def configure_from_args(args):
+    if args.vcan:
+        BUS_CONFIG.update(VCAN_CONFIG)
+    if args.interface:
+        BUS_CONFIG['interface'] = args.interface
+    if args.channel:
+        BUS_CONFIG['channel'] = args.channel
+
+def get_bus(monitored_ids=None, **overrides):
+    """monitored_ids: only these IDs are received, everything else is filtered before Python sees it"""
+    import can  # Only processes that open a bus pay for python-can
+    config = dict(BUS_CONFIG, **overrides)
+    if monitored_ids is not None:
+        config['can_filters'] = id_filters(monitored_ids)
+    print(f"🔌 Connecting to bus: {config['interface']} ({config['channel']})...")
+    return can.Bus(**config)
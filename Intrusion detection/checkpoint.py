@@ -0,0 +1,115 @@
+
+import math
+import os
+import struct
+import threading
+import time
+
+# Checkpoint / warm start of the learned detector state.
+# File layout (little endian):
+#   header: magic b"CIDS", version (uint16), number of records (uint32)
+#   record: arb_id (uint32), learning_phase (uint8), batch_count (uint32),
+#           12 doubles (DOUBLE_FIELDS), None is stored as NaN
+# One record is 105 bytes, so a snapshot of 1,000 IDs is ~105 kB.
+# This is the state of the detector core, the prefilter's learned period
+# included, for the registry's detectors and for the DetectorBank (through its
+# BankSlot views). The PMF histograms and the ECU clusters (shared between
+# IDs) are not part of it, so make_registry refuses to combine a checkpoint
+# with pmf or ecu_clusters instead of silently starting them cold.
+
+MAGIC = b"CIDS"
+VERSION = 2
+HEADER = struct.Struct("<4sHI")
+DOUBLE_FIELDS = ("P", "S", "O_acc", "mu_e", "sigma_e", "L_plus", "L_minus",
+                 "baseline_mu_T", "prev_mu_T", "period", "start_time", "learned_period")
+RECORD = struct.Struct("<IBI" + "d" * len(DOUBLE_FIELDS))
+
+SNAPSHOT_INTERVAL = 60.0  # Seconds between periodic snapshots
+
+def pack_state(detectors):
+    """Serializes {arb_id: detector} into the checkpoint format (cheap, no I/O)"""
+    parts = [HEADER.pack(MAGIC, VERSION, len(detectors))]
+    for arb_id, ids in detectors.items():
+        values = []
+        for name in DOUBLE_FIELDS:
+            value = getattr(ids, name, None)
+            values.append(math.nan if value is None else value)
+        parts.append(RECORD.pack(arb_id,
+                                 getattr(ids, "learning_phase", False),
+                                 getattr(ids, "batch_count", 0),
+                                 *values))
+    return b"".join(parts)
+
+def unpack_state(data):
+    """Returns {arb_id: {field: value}} from checkpoint bytes"""
+    magic, version, count = HEADER.unpack_from(data, 0)
+    if magic != MAGIC or version != VERSION:
+        raise ValueError(f"Not a CIDS checkpoint (version {VERSION})")
+
+    states = {}
+    for arb_id, learning_phase, batch_count, *values in RECORD.iter_unpack(data[HEADER.size:HEADER.size + count * RECORD.size]):
+        state = {name: (None if math.isnan(v) else v) for name, v in zip(DOUBLE_FIELDS, values)}
+        state["learning_phase"] = bool(learning_phase)
+        state["batch_count"] = batch_count
+        states[arb_id] = state
+    return states
+
+def apply_state(ids, state):
+    """Loads one record into a detector, only touching attributes the detector has"""
+    for name, value in state.items():
+        if hasattr(ids, name):
+            setattr(ids, name, value)
+
+def write_atomic(path, data):
+    tmp = f"{path}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+def save(path, detectors):
+    write_atomic(path, pack_state(detectors))
+
+def restore(registry, path):
+    """Creates (or updates) the detectors of a registry (or bank) from a checkpoint; returns the number of IDs"""
+    if not os.path.exists(path):
+        return 0
+    start = time.perf_counter()
+    with open(path, "rb") as f:
+        states = unpack_state(f.read())
+    for arb_id, state in states.items():
+        ids = registry.get(arb_id)
+        if ids is not None:
+            apply_state(ids, state)
+    print(f"Restored {len(states)} IDs from {path} in {(time.perf_counter() - start) * 1000:.1f} ms")
+    return len(states)
+
+class Checkpointer:
+    """
+    Periodic snapshots: the state is packed on the calling thread (a few us per ID)
+    and written by a background thread, so the detection loop never waits on disk.
+    A snapshot is skipped if the previous write has not finished.
+    """
+    def __init__(self, registry, path, interval=SNAPSHOT_INTERVAL):
+        self.registry = registry
+        self.path = path
+        self.interval = interval
+        self.next_snapshot = None   # Scheduled from the caller's clock on the first call
+        self.writer = None
+
+    def maybe_snapshot(self, now):
+        if self.next_snapshot is None:
+            self.next_snapshot = now + self.interval
+        if now < self.next_snapshot:
+            return
+        self.next_snapshot = now + self.interval
+        if self.writer is not None and self.writer.is_alive():
+            return
+        data = pack_state(self.registry.detectors)
+        self.writer = threading.Thread(target=write_atomic, args=(self.path, data), daemon=True)
+        self.writer.start()
+
+    def close(self):
+        """Final synchronous snapshot, e.g. on shutdown"""
+        if self.writer is not None:
+            self.writer.join()
+        save(self.path, self.registry.detectors)
@@ -1,105 +1,362 @@
 
+import argparse
+import heapq
 import time
-from bus_config import get_bus
+from collections import deque
+from bus_config import get_bus, add_bus_arguments, configure_from_args
+from checkpoint import Checkpointer, restore
+from telemetry import TelemetryWriter, QUIET, ALARMS, BATCHES
+from metrics import Metrics, serve, METRICS_PORT
+from ecu_clusters import ClusteredCIDS, EcuClusters
+from prefilter import with_prefilter
+from detector_core import CIDS, BATCH_SIZE, LAMBDA, THRESHOLD, K_PARAM, SUSPENSION_FAKE_INTERVAL
 
-# PARAMETERS
-BATCH_SIZE = 20     
-LAMBDA = 0.9995     
-THRESHOLD = 5.0     
-K_PARAM = 0.5       
+# PARAMETERS (detector defaults live in detector_core.py)
+RESYNC_FRAMES = 4096  # Incremental mode: re-sum the window now and then against rounding drift
 
-class CIDS:
-    def __init__(self):
-        self.P = 100.0      # Covariance
-        self.S = 0.0        # Skew (Slope)
-        self.O_acc = 0.0    # Accumulated Offset
-        self.timestamps = []
-        
-        # CUSUM Variables
-        self.mu_e = 0.0     
-        self.sigma_e = 0.005 
-        
-        self.L_plus = 0.0   # Upper Control Limit (Positive shifts)
-        self.L_minus = 0.0  # Lower Control Limit (Negative shifts)
-
-    def rls_update(self, t, error):
-        """Executes RLS update for Skew (S) and Covariance (P)"""
-        G = (self.P * t) / (LAMBDA + t * self.P * t)
-        self.P = (self.P - G * t * self.P) / LAMBDA
-        self.S = self.S + (G * error)
-
-    def process_batch(self, batch_times):
-        N = len(batch_times)
-        if N < 2: return 0.0, 0.0
-        
-        # 1. Calculate Average Interval
-        intervals = [batch_times[i] - batch_times[i-1] for i in range(1, N)]
-        mu_T = sum(intervals) / len(intervals)
-        
-        # 2. Calculate Batch Offset
-        offsets = []
-        t0 = batch_times[0]
-        for i in range(1, N):
-            expected = t0 + (i * mu_T)
-            actual = batch_times[i]
-            offsets.append(actual - expected)
-        
-        avg_offset = sum(offsets) / len(offsets)
-        
-        # 3. Accumulated Offset
-        self.O_acc += abs(avg_offset)
+# Suspension (Alg. 1): an ID that stays silent for this many learned periods
+# (0.5s for a 50ms ID) gets its open batch padded with huge intervals
+SUSPENSION_TIMEOUT_PERIODS = 10
+
+class IncrementalCIDS(CIDS):
+    """
+    Sliding-window mode: the last batch_size arrivals are kept with a running sum,
+    so mean interval, offset and O_acc update in O(1) per frame, and RLS/CUSUM run
+    every `every` arrivals instead of once per full non-overlapping batch.
+    With every == batch_size it matches CIDS (reference="batch") within floating-point rounding.
+    """
+    __slots__ = ("every", "window", "window_sum", "since_eval", "since_resync")
+
+    def __init__(self, every=1, **params):
+        super().__init__(**params)
+        self.every = every
+        self.window = deque(maxlen=self.batch_size)  # arrival times relative to the first frame
+        self.window_sum = 0.0
+        self.since_eval = 0
+        self.since_resync = 0
+
+    def add_frame(self, now):
+        if self.start_time is None:
+            self.start_time = now
+        t = now - self.start_time
         
-        # 4. Identification Error
-        t_k = batch_times[-1] - self.timestamps[0]
-        error = self.O_acc - (self.S * t_k)
+        window = self.window
+        if len(window) == self.batch_size:
+            self.window_sum -= window[0]   # oldest arrival drops out of the deque
+        window.append(t)
+        self.window_sum += t
         
-        # 5. Update Model
-        self.rls_update(t_k, error)
+        self.since_resync += 1
+        if self.since_resync >= RESYNC_FRAMES:
+            self.window_sum = sum(window)
+            self.since_resync = 0
         
-        return self.O_acc, error
+        self.since_eval += 1
+        if len(window) < self.batch_size or self.since_eval < self.every:
+            return None
+        self.since_eval = 0
+        return self.evaluate(t)
 
-    def check_cusum(self, error):
+    def evaluate(self, t):
+        """Runs the current window (last arrival at t) through offset, RLS and CUSUM"""
+        window = self.window
+        N = len(window)
         
-        normalized = (error - self.mu_e) / self.sigma_e
+        # 1. Average Interval (sum of intervals telescopes to last - first)
+        t0 = window[0]
+        mu_T = (t - t0) / (N - 1)
+        self.period = mu_T
         
-        # Update L+
-        self.L_plus = max(0, self.L_plus + normalized - K_PARAM)
+        # 2. Window Offset: mean of t_i - (t0 + i * mu_T) for i = 1..N-1
+        avg_offset = (self.window_sum - t0) / (N - 1) - t0 - mu_T * N / 2
         
-        # Update L- 
-        self.L_minus = max(0, self.L_minus - normalized - K_PARAM)
+        # 3. O_acc scaled so every frame counts once on average, RLS & CUSUM
+        error = self.update(t, avg_offset * self.every / N)
+        return self.O_acc, error, self.L_plus, self.L_minus
+
+    def process_suspension(self, now):
+        """Pushes padded arrivals until the window is evaluated, then starts a fresh window"""
+        period = self.period
+        fake_time = now
+        result = None
+        while result is None:
+            fake_time += SUSPENSION_FAKE_INTERVAL
+            result = self.add_frame(fake_time)
+        self.period = period
         
-        return self.L_plus, self.L_minus
+        # Real arrivals resume before the padded ones, so they must not share a window
+        self.reset_batch()
+        return result
+
+    def reset_batch(self):
+        self.window.clear()
+        self.window_sum = 0.0
+        self.since_eval = 0
+
+class DeadlineScheduler:
+    """
+    Min-heap of (deadline, arb_id) for the expected next arrival of every ID.
+    A frame only overwrites the ID's deadline in a dict; the single heap entry of
+    that ID is moved when it reaches the top, so nothing polls the silent IDs.
+    With the prefilter the first deadline after a frame is the gap check, and
+    suspensions keeps the suspension deadline that follows it.
+    """
+    def __init__(self):
+        self.heap = []
+        self.deadlines = {}   # arb_id -> current deadline
+        self.queued = {}      # arb_id -> key of its valid heap entry
+        self.suspensions = {} # arb_id -> suspension deadline while an earlier gap check is armed
+
+    def arm(self, arb_id, deadline):
+        self.deadlines[arb_id] = deadline
+        queued = self.queued.get(arb_id)
+        if queued is None or deadline < queued:
+            # Deadline moved earlier (or is new): the old heap entry becomes stale
+            self.queued[arb_id] = deadline
+            heapq.heappush(self.heap, (deadline, arb_id))
+
+    def disarm(self, arb_id):
+        self.deadlines.pop(arb_id, None)
+        self.queued.pop(arb_id, None)
+        self.suspensions.pop(arb_id, None)
+
+    def next_deadline(self):
+        return self.heap[0][0] if self.heap else None
 
-def run_cids():
-    bus = get_bus()
-    ids = CIDS()
-    print("CIDS Active. Monitoring ID 0x11 both negative and positive shifts")
+    def expired(self, now):
+        """Removes and returns the IDs whose deadline has passed"""
+        fired = []
+        heap = self.heap
+        while heap and heap[0][0] <= now:
+            key, arb_id = heapq.heappop(heap)
+            if self.queued.get(arb_id) != key:
+                continue  # stale entry
+            deadline = self.deadlines[arb_id]
+            if deadline > now:
+                # Frames arrived since the entry was pushed, move it to the real deadline
+                self.queued[arb_id] = deadline
+                heapq.heappush(heap, (deadline, arb_id))
+            else:
+                # Fired: suspensions stays, handle_deadlines reads it
+                del self.deadlines[arb_id], self.queued[arb_id]
+                fired.append(arb_id)
+        return fired
+
+    def __len__(self):
+        return len(self.deadlines)
+
+class DetectorRegistry:
+    """
+    Keeps one CIDS state per arbitration ID, created on the first frame of that ID.
+    allowed_ids: optional allow-list, frames of other IDs are ignored
+    id_params:   optional {arb_id: {"batch_size": .., "lam": .., "threshold": .., "k_param": ..}}
+    detector_cls: CIDS, or IncrementalCIDS for sliding-window detection
+    """
+    def __init__(self, allowed_ids=None, id_params=None, detector_cls=CIDS, **default_params):
+        self.allowed_ids = frozenset(allowed_ids) if allowed_ids is not None else None
+        self.detector_cls = detector_cls
+        self.id_params = id_params or {}
+        self.default_params = default_params
+        self.detectors = {}
+
+    def get(self, arb_id):
+        # Hot path: one dict lookup for IDs that are already monitored
+        ids = self.detectors.get(arb_id)
+        if ids is None:
+            if self.allowed_ids is not None and arb_id not in self.allowed_ids:
+                return None
+            params = dict(self.default_params)
+            params.update(self.id_params.get(arb_id, {}))
+            ids = self.detector_cls(**params)
+            self.detectors[arb_id] = ids
+        return ids
+
+    def __len__(self):
+        return len(self.detectors)
+
+    def __contains__(self, arb_id):
+        return arb_id in self.detectors
+
+def report(telemetry, arb_id, ids, result, now, suspended=False):
+    # DETECTION LOGIC (output is formatted and written by the telemetry thread)
+    telemetry.record(arb_id, now, now - ids.start_time, result, ids.alarm(), suspended)
+
+def make_registry(allowed_ids=None, id_params=None, every=None, checkpoint_path=None, metrics=None,
+                  ecu_clusters=False, pmf=False, prefilter=False):
+    """
+    every: evaluate a sliding window every `every` frames instead of per full batch
+    checkpoint_path: warm start from this checkpoint if it exists
+    metrics: Metrics to instrument the detectors with
+    ecu_clusters: share one skew fingerprint per ECU (IDs grouped by skew), see ecu_clusters.py
+    pmf: also compare each ID's interval histogram with its baseline PMF, see interval_histogram.py
+    prefilter: per-frame rate check ahead of the batch pipeline, see prefilter.py
+    """
+    if checkpoint_path and (ecu_clusters or pmf):
+        # Their state is not in the checkpoint, a warm start would silently start them cold
+        raise ValueError("Checkpoints hold the per-ID detector state only, they can not be combined with "
+                         "ECU clustering or the PMF check")
+    if ecu_clusters:
+        if every is not None:
+            raise ValueError("ECU clustering runs per full batch, it can not be combined with every")
+        detector_cls, params = ClusteredCIDS, {"clusters": EcuClusters()}
+    elif every is None:
+        detector_cls, params = CIDS, {}
+    else:
+        detector_cls, params = IncrementalCIDS, {"every": every}
+    if pmf:
+        from interval_histogram import with_pmf  # Pulls in NumPy
+        detector_cls = with_pmf(detector_cls)
+    if prefilter:
+        detector_cls = with_prefilter(detector_cls)
+    if metrics is not None:
+        detector_cls = metrics.instrument(detector_cls)
+    registry = DetectorRegistry(allowed_ids, id_params, detector_cls, **params)
+    if metrics is not None:
+        metrics.registry = registry
+    if checkpoint_path:
+        restore(registry, checkpoint_path)
+    if allowed_ids is None:
+        print("CIDS Active. Monitoring all IDs for both negative and positive shifts")
+    else:
+        id_list = ", ".join(f"0x{arb_id:X}" for arb_id in sorted(allowed_ids))
+        print(f"CIDS Active. Monitoring IDs {id_list} for both negative and positive shifts")
+    return registry
+
+def make_metrics(port=None, telemetry=None):
+    """Metrics served on localhost:port, or None if port is None"""
+    if port is None:
+        return None
+    metrics = Metrics()
+    if telemetry is not None:
+        metrics.gauge("cids_telemetry_dropped_total", "Log records dropped by the telemetry writer",
+                      lambda: telemetry.dropped + telemetry.dropped_alarms, "counter")
+    serve(metrics, port)
+    return metrics
+
+def make_telemetry(args=None):
+    """TelemetryWriter from the --log/--alarm-log/--sample/-v/-q options (defaults without args)"""
+    if args is None:
+        return TelemetryWriter()
+    verbosity = QUIET if args.quiet else min(ALARMS + args.verbose, BATCHES)
+    return TelemetryWriter(args.log, args.alarm_log, args.sample, verbosity)
+
+def handle_frame(registry, scheduler, telemetry, arb_id, now):
+    ids = registry.get(arb_id)
+    if ids is None:
+        return
     
-    batch_buffer = []
+    result = ids.add_frame(now)
+    if ids.period:
+        arm_deadline(scheduler, arb_id, ids, now + SUSPENSION_TIMEOUT_PERIODS * ids.period)
+    if result is not None:
+        report(telemetry, arb_id, ids, result, now)
+
+def arm_deadline(scheduler, arb_id, ids, suspension):
+    """Arms the suspension deadline, or first the ID's gap check if that comes earlier (prefilter)"""
+    gap = ids.gap_deadline()
+    if gap is not None and gap < suspension:
+        scheduler.arm(arb_id, gap)
+        scheduler.suspensions[arb_id] = suspension
+    else:
+        scheduler.arm(arb_id, suspension)
+        scheduler.suspensions.pop(arb_id, None)
+
+def handle_deadlines(registry, scheduler, telemetry, now):
+    for arb_id in scheduler.expired(now):
+        ids = registry.detectors[arb_id]
+        suspension = scheduler.suspensions.pop(arb_id, None)
+        if suspension is not None:
+            # GAP LOGIC: silent for too long, whether or not a frame ever comes back
+            result = ids.check_gap(now)
+            if result is not None:
+                report(telemetry, arb_id, ids, result, now)
+            if now < suspension:
+                scheduler.arm(arb_id, suspension)
+                continue
+
+        # SUSPENSION LOGIC: IDs that missed their deadline
+        report(telemetry, arb_id, ids, ids.process_suspension(now), now, suspended=True)
+        # Keep evaluating while the ID stays silent
+        arm_deadline(scheduler, arb_id, ids, now + SUSPENSION_TIMEOUT_PERIODS * ids.period)
+
+def run_cids(allowed_ids=None, id_params=None, every=None, checkpoint_path=None, telemetry=None,
+             metrics_port=None, ecu_clusters=False, pmf=False, prefilter=False, bus=None, clock=time.time):
+    """
+    telemetry: TelemetryWriter for the batch log and alarms (default: print alarms only)
+    metrics_port: serve Prometheus metrics on this local port
+    ecu_clusters: one shared skew fingerprint per ECU, masquerade alarm on skew divergence
+    pmf: extra "PMF Shift" alarm when the interval distribution of an ID changes
+    prefilter: "Flood" / "Gap" alarms per frame, the batch pipeline is sampled for flooded IDs
+    bus, clock: an open bus and the time source instead of the configured bus and time.time
+                (harness.py runs the loop on a virtual clock)
+    """
+    bus = bus or get_bus(monitored_ids=allowed_ids)
+    telemetry = telemetry or make_telemetry()
+    metrics = make_metrics(metrics_port, telemetry)
+    registry = make_registry(allowed_ids, id_params, every, checkpoint_path, metrics, ecu_clusters, pmf,
+                             prefilter)
+    scheduler = DeadlineScheduler()
+    if metrics:
+        metrics.gauge("cids_frames_received_total", "Frames received", lambda: metrics.frames, "counter")
+        # No queue in this loop: frames are only lost in the bus driver, which python-can does not report
+        metrics.gauge("cids_frames_dropped_total", "Frames dropped before detection", lambda: 0, "counter")
+        metrics.gauge("cids_pending_deadlines", "IDs waiting for their suspension deadline", lambda: len(scheduler))
+    checkpointer = Checkpointer(registry, checkpoint_path) if checkpoint_path else None
     
-    for msg in bus:
-        if msg.arbitration_id == 0x11:
-            now = time.time()
-            if not ids.timestamps: ids.timestamps.append(now)
-            batch_buffer.append(now)
+    try:
+        while True:
+            # Block on the bus only until the next ID is due
+            next_deadline = scheduler.next_deadline()
+            timeout = None if next_deadline is None else max(0.0, next_deadline - clock())
+            if checkpointer:
+                timeout = checkpointer.interval if timeout is None else min(timeout, checkpointer.interval)
+            msg = bus.recv(timeout)
+            now = clock()
             
-            if len(batch_buffer) >= BATCH_SIZE:
-                O_acc, error = ids.process_batch(batch_buffer)
-                
-                # Get both Limits
-                L_plus, L_minus = ids.check_cusum(error)
-                
-                # Print output
-                status = f"L+: {L_plus:.2f} | L-: {L_minus:.2f}"
-                print(f"O_acc: {O_acc:.4f} | Error: {error:.4f} | {status}")
-                
-                # DETECTION LOGIC
-                if L_plus > THRESHOLD:
-                    print("INTRUSION DETECTED (Positive Shift )")
-                elif L_minus > THRESHOLD:
-                    print("INTRUSION DETECTED (Negative Shift )")
-                
-                batch_buffer = []
+            if msg is not None:
+                if metrics:
+                    metrics.frames += 1
+                handle_frame(registry, scheduler, telemetry, msg.arbitration_id, now)
+            handle_deadlines(registry, scheduler, telemetry, now)
+            if checkpointer:
+                checkpointer.maybe_snapshot(now)
+    except KeyboardInterrupt:
+        print("CIDS stopped")
+    finally:
+        if checkpointer:
+            checkpointer.close()
+        telemetry.close()
+        bus.shutdown()
+
+def build_parser(description="CIDS live detector", registry_options=True):
+    parser = argparse.ArgumentParser(description=description)
+    add_detector_arguments(parser, registry_options)
+    return parser
+
+def add_detector_arguments(parser, registry_options=True):
+    """Detector, logging and bus options of the live detectors (also used by cli.py)"""
+    parser.add_argument("--ids", nargs="+", type=lambda x: int(x, 0),
+                        help="only monitor these arbitration IDs, e.g. 0x11 (filtered on the bus)")
+    if registry_options:
+        parser.add_argument("--every", type=int, help="sliding-window mode: evaluate every N frames")
+        parser.add_argument("--checkpoint", help="warm start from / snapshot to this file")
+        parser.add_argument("--ecu-clusters", action="store_true",
+                            help="group IDs by clock skew and share one fingerprint per ECU")
+        parser.add_argument("--pmf", action="store_true",
+                            help="also alarm when the interval histogram of an ID drifts from its baseline")
+        parser.add_argument("--prefilter", action="store_true",
+                            help="per-frame flood/gap check ahead of the batch pipeline")
+        parser.add_argument("--metrics-port", type=int, help=f"serve Prometheus metrics on localhost, e.g. {METRICS_PORT}")
+    parser.add_argument("--log", help="per-batch log, CSV or binary (.bin), e.g. cids_full_log.csv")
+    parser.add_argument("--alarm-log", help="alarm log, CSV or binary (.bin), e.g. cids_log.csv")
+    parser.add_argument("--sample", type=int, default=1, help="log every N-th batch (alarms are always logged)")
+    parser.add_argument("-v", "--verbose", action="count", default=0, help="also print every logged batch")
+    parser.add_argument("-q", "--quiet", action="store_true", help="no console output, files only")
+    add_bus_arguments(parser)
 
 if __name__ == "__main__":
-    run_cids()
\ No newline at end of file
+    args = build_parser().parse_args()
+    configure_from_args(args)
+    run_cids(args.ids, every=args.every, checkpoint_path=args.checkpoint, telemetry=make_telemetry(args),
+             metrics_port=args.metrics_port, ecu_clusters=args.ecu_clusters, pmf=args.pmf,
+             prefilter=args.prefilter)
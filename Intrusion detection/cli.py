@@ -0,0 +1,147 @@
+
+import argparse
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from cids import add_detector_arguments
+from replay import add_replay_arguments
+
+# One entry point for everything that used to be a loose script:
+#   python cli.py detect [--pipelined] [--ids 0x11 ...]   live detector
+#   python cli.py detect --dashboard 0x11 0x120          ... with a live plot
+#   python cli.py simulate fabrication masquerade         run (or load) simulations
+#   python cli.py replay drive1.blf -o replay_log.csv     replay recorded traces
+#   python cli.py plot 6a 6b 8 --jobs 3                   render the paper figures
+# Only the modules a subcommand needs are imported when it runs: detect never
+# loads NumPy, matplotlib or pandas, and plot uses the non-interactive Agg
+# backend, saves the figures and renders each one in its own process.
+
+SEED = 0  # Default seed of the simulation scripts, so their cached runs are shared
+SCENARIOS = ("fabrication", "suspension", "masquerade")
+FIGURES = {
+    "6a": ("fabrication", "Fabrication Attack", "figure_6a_replication.png"),
+    "6b": ("suspension", "Suspension Attack", "figure_6b_replication.png"),
+    "8": ("masquerade", None, "figure_8_replication.png"),
+}
+
+def simulate(scenario, seed, force=False, out_dir=None):
+    """Result of one scenario: from the cache, or written columnar to out_dir"""
+    if scenario == "masquerade":
+        import simulation_masquerade as masquerade
+        if out_dir:
+            return masquerade.run_masquerade_simulation(seed, out_dir)
+        return masquerade.cached_masquerade_simulation(seed, force)
+
+    import simulation_fabr_sups as fabr_sups
+    if out_dir:
+        return fabr_sups.run_dual_simulation_vectorized(scenario, seed, out_dir=out_dir)
+    return fabr_sups.cached_dual_simulation(scenario, seed, force)
+
+def render_figure(figure, seed, force=False, output_dir="."):
+    """Runs (or loads) the scenario of one figure and saves it; top-level for the process pool"""
+    import matplotlib
+    matplotlib.use("Agg")
+
+    scenario, title, filename = FIGURES[figure]
+    result = simulate(scenario, seed, force)
+    path = os.path.join(output_dir, filename)
+    if scenario == "masquerade":
+        import simulation_masquerade as masquerade
+        masquerade.plot_figure_8_final(*result, filename=path)
+    else:
+        import simulation_fabr_sups as fabr_sups
+        fabr_sups.plot_paper_figure(*result, title, path)
+    return path
+
+def cmd_detect(args):
+    from bus_config import configure_from_args
+    from cids import make_telemetry
+    configure_from_args(args)
+    options = dict(every=args.every, checkpoint_path=args.checkpoint, metrics_port=args.metrics_port,
+                   ecu_clusters=args.ecu_clusters, pmf=args.pmf, prefilter=args.prefilter)
+    if args.pipelined:
+        from ingest import run_cids_pipelined as run
+    else:
+        from cids import run_cids as run
+
+    telemetry = make_telemetry(args)
+    if args.dashboard:
+        from dashboard import run_with_dashboard
+        run_with_dashboard(args.dashboard, run, telemetry, args.ids, **options)
+    else:
+        run(args.ids, telemetry=telemetry, **options)
+
+def cmd_simulate(args):
+    for scenario in args.scenarios or SCENARIOS:
+        start = time.perf_counter()
+        result = simulate(scenario, args.seed, args.force, args.out_dir)
+        log = result[0]
+        limit = "L_Minus" if scenario == "masquerade" else "L_Plus"
+        peak = float(log[limit].max()) if len(log[limit]) else 0.0
+        print(f"{scenario}: {len(log['Time_Sec'])} batches, max {limit} {peak:.2f} "
+              f"({time.perf_counter() - start:.2f}s)")
+
+def cmd_replay(args):
+    from replay import replay_from_args
+    replay_from_args(args)
+
+def cmd_plot(args):
+    os.makedirs(args.output_dir, exist_ok=True)
+    figures = list(dict.fromkeys(args.figures or FIGURES))
+    start = time.perf_counter()
+    if args.jobs == 1:
+        paths = [render_figure(f, args.seed, args.force, args.output_dir) for f in figures]
+    else:
+        with ProcessPoolExecutor(max_workers=args.jobs or len(figures)) as pool:
+            futures = [pool.submit(render_figure, f, args.seed, args.force, args.output_dir) for f in figures]
+            paths = [future.result() for future in futures]
+    print(f"Rendered {len(paths)} figures in {time.perf_counter() - start:.2f}s")
+
+def one_of(options):
+    # choices= rejects the empty default of an optional positional list
+    def check(value):
+        if value not in options:
+            raise argparse.ArgumentTypeError(f"choose from {', '.join(options)}")
+        return value
+    return check
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="CIDS clock-skew intrusion detection")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    detect = commands.add_parser("detect", help="live detector on the CAN bus")
+    add_detector_arguments(detect)
+    detect.add_argument("--pipelined", action="store_true",
+                        help="receive on a separate thread through a bounded queue (ingest.py)")
+    detect.add_argument("--dashboard", nargs="+", type=lambda x: int(x, 0), metavar="ID",
+                        help="live plot of these arbitration IDs (dashboard.py)")
+    detect.set_defaults(func=cmd_detect)
+
+    sim = commands.add_parser("simulate", help="run the paper scenarios (cached, see sim_cache.py)")
+    sim.add_argument("scenarios", nargs="*", type=one_of(SCENARIOS),
+                     help=f"{', '.join(SCENARIOS)} (default: all)")
+    sim.add_argument("--seed", type=int, default=SEED)
+    sim.add_argument("--force", action="store_true", help="re-run even if the result is cached")
+    sim.add_argument("--out-dir", help="write the per-batch columns here instead of the cache")
+    sim.set_defaults(func=cmd_simulate)
+
+    rep = commands.add_parser("replay", help="replay recorded CAN traces through the detector")
+    add_replay_arguments(rep)
+    rep.set_defaults(func=cmd_replay)
+
+    plot = commands.add_parser("plot", help="render Figures 6a, 6b and 8 to PNG files")
+    plot.add_argument("figures", nargs="*", type=one_of(FIGURES), help=f"{', '.join(FIGURES)} (default: all)")
+    plot.add_argument("--jobs", type=int, help="render processes (default: one per figure, 1 = in this process)")
+    plot.add_argument("--seed", type=int, default=SEED)
+    plot.add_argument("--force", action="store_true", help="re-run the simulations even if they are cached")
+    plot.add_argument("--output-dir", default=".")
+    plot.set_defaults(func=cmd_plot)
+    return parser
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    args.func(args)
+
+if __name__ == "__main__":
+    main()
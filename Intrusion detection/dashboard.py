@@ -0,0 +1,266 @@
+
+import multiprocessing as mp
+import queue as queue_module
+import threading
+import time
+from collections import deque
+import numpy as np
+from detector_core import THRESHOLD
+
+# Live view of O_acc, identification error and L+/L- for a few selected IDs.
+# The detection thread only appends a tuple to a bounded deque (DashboardFeed
+# wraps the TelemetryWriter). A forwarder thread sends what has accumulated to
+# the dashboard process once per frame, through a bounded queue that drops
+# frames when the GUI falls behind, so drawing never competes with detection
+# for the GIL. Every series is kept as a min/max summary of at most DASH_BUCKETS buckets:
+# when it is full, neighbouring buckets are merged and the bucket width doubles,
+# so memory and redraw cost stay the same however long the run is, and spikes
+# (alarms) survive the decimation. Frames are drawn with blitting; the axes are
+# only redrawn in full when the data leaves the current limits.
+
+FEED_SIZE = 65536     # Batch records waiting for the forwarder (the oldest are dropped)
+FEED_FRAMES = 64      # Forwarded frames waiting for the dashboard process
+DASH_BUCKETS = 512    # Min/max buckets per series (two points each, about one per pixel)
+DASH_FPS = 10
+SERIES = ("O_acc", "error", "L_plus", "L_minus")
+
+class DashboardFeed:
+    """Telemetry wrapper that also queues the batches of the selected IDs for the dashboard"""
+    def __init__(self, telemetry, arb_ids, size=FEED_SIZE):
+        self.telemetry = telemetry
+        self.arb_ids = frozenset(arb_ids)
+        self.batches = deque(maxlen=size)
+        self.dropped_frames = 0
+        self.stopping = threading.Event()
+        self.thread = None
+
+    def record(self, arb_id, now, time_sec, result, shift=None, suspended=False):
+        self.telemetry.record(arb_id, now, time_sec, result, shift, suspended)
+        if arb_id in self.arb_ids:
+            self.batches.append((arb_id, time_sec, result, shift))
+
+    def drain(self):
+        popleft = self.batches.popleft
+        return [popleft() for _ in range(len(self.batches))]
+
+    def start(self, frames, interval):
+        """Forwards the queued batches to the frames queue every interval seconds"""
+        def forward():
+            while not self.stopping.wait(interval):
+                batches = self.drain()
+                if not batches:
+                    continue
+                try:
+                    frames.put_nowait(batches)
+                except queue_module.Full:
+                    self.dropped_frames += 1
+        self.thread = threading.Thread(target=forward, daemon=True)
+        self.thread.start()
+
+    def close(self):
+        self.stopping.set()
+        if self.thread:
+            self.thread.join()
+        self.telemetry.close()
+
+    def __getattr__(self, name):
+        # dropped, dropped_alarms ... of the wrapped telemetry
+        return getattr(self.telemetry, name)
+
+class MinMaxSeries:
+    """Bounded min/max envelope of a growing (t, value) series"""
+    def __init__(self, max_buckets=DASH_BUCKETS):
+        self.max_buckets = max_buckets
+        self.width = 1        # Points per bucket
+        self.n = 0            # Closed buckets
+        self.fill = 0         # Points in the open bucket
+        # Columns: t_min, v_min, t_max, v_max
+        self.buckets = np.empty((max_buckets, 4))
+        self.open = None
+
+    def add(self, t, value):
+        b = self.open
+        if b is None:
+            self.open = [t, value, t, value]
+        else:
+            if value < b[1]:
+                b[0], b[1] = t, value
+            if value >= b[3]:
+                b[2], b[3] = t, value
+        self.fill += 1
+        if self.fill < self.width:
+            return
+
+        self.buckets[self.n] = self.open
+        self.n += 1
+        self.open = None
+        self.fill = 0
+        if self.n == self.max_buckets:
+            self._merge()
+
+    def _merge(self):
+        pairs = self.buckets.reshape(-1, 2, 4)
+        merged = self.buckets[:self.max_buckets // 2]
+        lo = np.argmin(pairs[:, :, 1], axis=1)
+        hi = np.argmax(pairs[:, :, 3], axis=1)
+        rows = np.arange(len(pairs))
+        merged[:, :2] = pairs[rows, lo, :2]
+        merged[:, 2:] = pairs[rows, hi, 2:]
+        self.n = self.max_buckets // 2
+        self.width *= 2
+
+    def points(self):
+        """(t, value) arrays: the min and max of every bucket in time order"""
+        buckets = self.buckets[:self.n]
+        if self.open is not None:
+            buckets = np.vstack([buckets, self.open])
+        if len(buckets) == 0:
+            return np.empty(0), np.empty(0)
+        lo, hi = buckets[:, :2], buckets[:, 2:]
+        first = np.where((lo[:, 0] <= hi[:, 0])[:, None], lo, hi)
+        second = np.where((lo[:, 0] <= hi[:, 0])[:, None], hi, lo)
+        pts = np.stack([first, second], axis=1).reshape(-1, 2)
+        return pts[:, 0], pts[:, 1]
+
+class QueueSource:
+    """Dashboard side of the frames queue"""
+    def __init__(self, frames):
+        self.frames = frames
+
+    def drain(self):
+        batches = []
+        while True:
+            try:
+                batches.extend(self.frames.get_nowait())
+            except queue_module.Empty:
+                return batches
+
+class Dashboard:
+    """source: anything with drain() -> [(arb_id, time_sec, result, shift), ...]"""
+    def __init__(self, source, arb_ids, threshold=THRESHOLD, max_buckets=DASH_BUCKETS):
+        import matplotlib.pyplot as plt  # Only the GUI process pays for matplotlib
+        self.plt = plt
+        self.source = source
+        self.arb_ids = sorted(arb_ids)
+        self.series = {(arb_id, name): MinMaxSeries(max_buckets) for arb_id in self.arb_ids for name in SERIES}
+        self.alarms = {arb_id: None for arb_id in self.arb_ids}
+
+        self.fig, (ax1, ax2, ax3) = plt.subplots(3, 1, figsize=(10, 8), sharex=True)
+        self.axes = {"O_acc": ax1, "error": ax2, "L_plus": ax3, "L_minus": ax3}
+        self.lines = {}
+        for i, arb_id in enumerate(self.arb_ids):
+            color = f"C{i}"
+            for name, ax in self.axes.items():
+                style = "--" if name == "L_minus" else "-"
+                label = f"0x{arb_id:X}" if name != "L_minus" else None
+                line, = ax.plot([], [], style, color=color, lw=1.2, label=label, animated=True)
+                self.lines[(arb_id, name)] = line
+        ax1.set_ylabel(r"$O_{acc}$ [ms]")
+        ax2.set_ylabel(r"Ident Error $e$ [ms]")
+        ax3.set_ylabel(r"$L^+$ (solid) / $L^-$ (dashed)")
+        ax3.set_xlabel("Time [Sec]")
+        ax3.axhline(threshold, color="black", linestyle="-.", lw=1)
+        for ax in (ax1, ax2, ax3):
+            ax.grid(True, alpha=0.3)
+            ax.set_xlim(0, 60)
+        ax1.legend(loc="upper left")
+        self.status = self.fig.text(0.01, 0.99, "", va="top", fontsize=9, animated=True)
+
+        self.fig.tight_layout(rect=(0, 0, 1, 0.97))
+        self.background = None
+        self.fig.canvas.mpl_connect("draw_event", self._on_draw)
+        self.fig.canvas.draw()
+
+    def _on_draw(self, event):
+        # Full redraw (start, resize, rescale): keep the static parts for blitting
+        self.background = self.fig.canvas.copy_from_bbox(self.fig.bbox)
+        self._draw_artists()
+
+    def _draw_artists(self):
+        for line in self.lines.values():
+            line.axes.draw_artist(line)
+        self.fig.draw_artist(self.status)
+
+    def update(self):
+        """Drains the feed and redraws; returns the number of new batches"""
+        batches = self.source.drain()
+        for arb_id, time_sec, (O_acc, error, L_plus, L_minus), shift in batches:
+            series = self.series
+            series[(arb_id, "O_acc")].add(time_sec, O_acc * 1000)
+            series[(arb_id, "error")].add(time_sec, error * 1000)
+            series[(arb_id, "L_plus")].add(time_sec, L_plus)
+            series[(arb_id, "L_minus")].add(time_sec, L_minus)
+            self.alarms[arb_id] = shift
+
+        for key, line in self.lines.items():
+            line.set_data(*self.series[key].points())
+        self.status.set_text("   ".join(f"0x{arb_id:X}: {shift or 'ok'}" for arb_id, shift in self.alarms.items()))
+
+        canvas = self.fig.canvas
+        if self._rescale() or self.background is None:
+            canvas.draw()   # _on_draw draws the lines on the new background
+        else:
+            canvas.restore_region(self.background)
+            self._draw_artists()
+            canvas.blit(self.fig.bbox)
+        canvas.flush_events()
+        return len(batches)
+
+    def _rescale(self):
+        """Grows the axes limits when the data has left them; returns True if they changed"""
+        changed = False
+        t_end = 0.0
+        for ax in set(self.axes.values()):
+            lows, highs = [], []
+            for key, line in self.lines.items():
+                if line.axes is ax and len(line.get_ydata()):
+                    lows.append(np.min(line.get_ydata()))
+                    highs.append(np.max(line.get_ydata()))
+                    t_end = max(t_end, line.get_xdata()[-1])
+            if not lows:
+                continue
+            low, high = min(lows), max(highs)
+            y0, y1 = ax.get_ylim()
+            if low < y0 or high > y1:
+                # Headroom so the limits change rarely (a full redraw each time)
+                margin = 0.25 * max(high - low, 1e-9)
+                ax.set_ylim(min(low, y0) - margin, max(high, y1) + margin)
+                changed = True
+        x0, x1 = self.axes["O_acc"].get_xlim()
+        if t_end > x1:
+            self.axes["O_acc"].set_xlim(x0, max(t_end * 1.5, x1))
+            changed = True
+        return changed
+
+    def run(self, fps=DASH_FPS):
+        """Redraws at a fixed frame rate until the window is closed"""
+        plt = self.plt
+        plt.show(block=False)
+        interval = 1.0 / fps
+        while plt.fignum_exists(self.fig.number):
+            start = time.perf_counter()
+            self.update()
+            self.fig.canvas.start_event_loop(max(0.001, interval - (time.perf_counter() - start)))
+
+def dashboard_process(arb_ids, frames, threshold=THRESHOLD, fps=DASH_FPS):
+    """Entry point of the dashboard process"""
+    try:
+        Dashboard(QueueSource(frames), arb_ids, threshold).run(fps)
+    except KeyboardInterrupt:
+        pass
+
+def run_with_dashboard(arb_ids, run, telemetry, allowed_ids=None, fps=DASH_FPS, threshold=THRESHOLD, **options):
+    """
+    Runs the detector loop run(allowed_ids, telemetry=..., **options), e.g. cids.run_cids,
+    with a live dashboard of arb_ids in a separate process. Closing the window
+    only closes the dashboard.
+    """
+    ctx = mp.get_context("spawn")
+    frames = ctx.Queue(FEED_FRAMES)
+    process = ctx.Process(target=dashboard_process, args=(sorted(arb_ids), frames, threshold, fps), daemon=True)
+    process.start()
+
+    feed = DashboardFeed(telemetry, arb_ids)
+    feed.start(frames, 1.0 / fps)
+    # run() closes the feed (and the telemetry) when it stops
+    run(allowed_ids, telemetry=feed, **options)
@@ -0,0 +1,249 @@
+
+import math
+import time
+import numpy as np
+import can
+from bus_config import get_bus, configure_from_args
+from checkpoint import Checkpointer, restore
+from cids import build_parser, make_telemetry
+from detector_core import BATCH_SIZE, LAMBDA, THRESHOLD, K_PARAM, SIGMA_E
+from ingest import FrameQueue, QUEUE_SIZE, DRAIN_MAX
+
+# Struct-of-arrays version of detector_core.CIDS (reference="batch", fixed
+# sigma_e, as in the live detector): the state of every monitored ID lives in
+# one slot of contiguous NumPy arrays, and all batches that completed since the
+# last tick go through interval/offset, RLS and CUSUM as one vectorized step.
+# Sums are taken sequentially (cumsum) so the results are bit-identical to CIDS.
+
+STATE_FIELDS = ("P", "S", "O_acc", "mu_e", "sigma_e", "L_plus", "L_minus", "start_time",
+                "lam", "threshold", "k_param")
+LEARNED_FIELDS = STATE_FIELDS[:8]  # Checkpointed; the parameters come from the configuration
+
+class BankSlot:
+    """Attribute view of one ID of a DetectorBank, so checkpoint.py handles it like a CIDS"""
+    __slots__ = ("bank", "slot")
+
+    def __init__(self, bank, slot):
+        object.__setattr__(self, "bank", bank)
+        object.__setattr__(self, "slot", slot)
+
+    def __getattr__(self, name):
+        if name not in LEARNED_FIELDS:
+            raise AttributeError(name)
+        value = float(getattr(self.bank, name)[self.slot])
+        return None if math.isnan(value) else value
+
+    def __setattr__(self, name, value):
+        if name not in LEARNED_FIELDS:
+            raise AttributeError(name)
+        getattr(self.bank, name)[self.slot] = math.nan if value is None else value
+
+class DetectorBank:
+    """
+    allowed_ids: optional allow-list, frames of other IDs are ignored
+    id_params:   optional {arb_id: {"lam": .., "threshold": .., "k_param": ..}}
+    All IDs of one bank share the batch size.
+    """
+    def __init__(self, batch_size=BATCH_SIZE, allowed_ids=None, id_params=None, capacity=64,
+                 lam=LAMBDA, threshold=THRESHOLD, k_param=K_PARAM):
+        self.batch_size = batch_size
+        self.allowed_ids = frozenset(allowed_ids) if allowed_ids is not None else None
+        self.id_params = id_params or {}
+        self.defaults = {"lam": lam, "threshold": threshold, "k_param": k_param}
+
+        self.slots = {}       # arb_id -> slot
+        self.arb_ids = []     # slot -> arb_id
+        self.buffers = []     # slot -> open batch (python list, cheap appends)
+        self.completed = []   # (slot, batch) in completion order, processed on tick()
+        self.size = 0
+        self._allocate(capacity)
+
+    def _allocate(self, capacity):
+        old_size = self.size
+        for name in STATE_FIELDS:
+            arr = np.zeros(capacity)
+            if old_size:
+                arr[:old_size] = getattr(self, name)[:old_size]
+            setattr(self, name, arr)
+        self.capacity = capacity
+
+    def _new_slot(self, arb_id):
+        if self.size == self.capacity:
+            self._allocate(2 * self.capacity)
+        slot = self.size
+        self.size += 1
+
+        params = dict(self.defaults)
+        params.update(self.id_params.get(arb_id, {}))
+        self.P[slot] = 100.0
+        self.sigma_e[slot] = SIGMA_E
+        self.start_time[slot] = np.nan
+        self.lam[slot] = params["lam"]
+        self.threshold[slot] = params["threshold"]
+        self.k_param[slot] = params["k_param"]
+
+        self.slots[arb_id] = slot
+        self.arb_ids.append(arb_id)
+        self.buffers.append([])
+        return slot
+
+    def add_frame(self, arb_id, now):
+        """Buffers one arrival; returns False if the ID is not monitored"""
+        slot = self.slots.get(arb_id)
+        if slot is None:
+            if self.allowed_ids is not None and arb_id not in self.allowed_ids:
+                return False
+            slot = self._new_slot(arb_id)
+            self.start_time[slot] = now
+
+        buf = self.buffers[slot]
+        buf.append(now)
+        if len(buf) >= self.batch_size:
+            self.completed.append((slot, buf))
+            self.buffers[slot] = []
+        return True
+
+    def tick(self):
+        """
+        Processes every batch completed since the last tick.
+        Returns (arb_ids, O_acc, error, L_plus, L_minus, alarm) arrays, one entry per batch.
+        """
+        completed, self.completed = self.completed, []
+        if not completed:
+            empty = np.empty(0)
+            return np.empty(0, dtype=np.int64), empty, empty, empty, empty, np.empty(0, dtype=bool)
+
+        slots = np.fromiter((slot for slot, _ in completed), dtype=np.int64, count=len(completed))
+        batches = np.array([batch for _, batch in completed])
+        N = batches.shape[1]
+
+        # 1. Average Interval (the intervals telescope to last - first), all batches at once
+        t0 = batches[:, 0]
+        mu_T = (batches[:, -1] - t0) / (N - 1)
+
+        # 2. Batch Offset: mean of t_i - (t0 + i * mu_T) for i = 1..N-1
+        acc = np.cumsum(batches - t0[:, None], axis=1)[:, -1]
+        avg_offset = acc / (N - 1) - mu_T * N / 2
+        t_end = batches[:, -1]
+
+        # The recursive steps need the batches of one ID in order: one round per batch
+        rounds = [[]]
+        seen = {}
+        for i, (slot, _) in enumerate(completed):
+            k = seen.get(slot, 0)
+            seen[slot] = k + 1
+            if k == len(rounds):
+                rounds.append([])
+            rounds[k].append(i)
+
+        if len(rounds) == 1:
+            return self._step(slots, avg_offset, t_end)
+        out = [self._step(slots[r], avg_offset[r], t_end[r]) for r in map(np.array, rounds)]
+        return tuple(np.concatenate(cols) for cols in zip(*out))
+
+    def _step(self, slots, avg_offset, t_end):
+        # 3. Accumulated Offset
+        O_acc = self.O_acc[slots] + np.abs(avg_offset)
+
+        # 4. Identification Error
+        t = t_end - self.start_time[slots]
+        S = self.S[slots]
+        error = O_acc - (S * t)
+
+        # 5. CUSUM Update
+        k_param = self.k_param[slots]
+        normalized = (error - self.mu_e[slots]) / self.sigma_e[slots]
+        L_plus = np.maximum(0.0, self.L_plus[slots] + normalized - k_param)
+        L_minus = np.maximum(0.0, self.L_minus[slots] - normalized - k_param)
+
+        # 6. RLS Update
+        P, lam = self.P[slots], self.lam[slots]
+        G = (P * t) / (lam + t * P * t)
+        P = (P - G * t * P) / lam
+        S = S + (G * error)
+
+        self.O_acc[slots] = O_acc
+        self.P[slots] = P
+        self.S[slots] = S
+        self.L_plus[slots] = L_plus
+        self.L_minus[slots] = L_minus
+
+        threshold = self.threshold[slots]
+        alarm = (L_plus > threshold) | (L_minus > threshold)
+        arb_ids = np.array([self.arb_ids[s] for s in slots.tolist()], dtype=np.int64)
+        return arb_ids, O_acc, error, L_plus, L_minus, alarm
+
+    def get(self, arb_id):
+        """BankSlot of an ID (created if new), None if it is not monitored (as DetectorRegistry.get)"""
+        slot = self.slots.get(arb_id)
+        if slot is None:
+            if self.allowed_ids is not None and arb_id not in self.allowed_ids:
+                return None
+            slot = self._new_slot(arb_id)
+        return BankSlot(self, slot)
+
+    @property
+    def detectors(self):
+        """{arb_id: BankSlot}, what the Checkpointer snapshots"""
+        return {arb_id: BankSlot(self, slot) for arb_id, slot in self.slots.items()}
+
+    def state(self, arb_id):
+        """Current state of one ID as a dict (for inspection and comparison with CIDS)"""
+        slot = self.slots[arb_id]
+        return {name: float(getattr(self, name)[slot]) for name in STATE_FIELDS}
+
+    def __len__(self):
+        return self.size
+
+    def __contains__(self, arb_id):
+        return arb_id in self.slots
+
+def record_tick(bank, telemetry, now):
+    """One vectorized tick; every processed batch goes to telemetry (shift as in the CIDS loop)"""
+    arb_ids, O_acc, error, L_plus, L_minus, alarm = bank.tick()
+    for arb_id, *result, is_alarm in zip(arb_ids.tolist(), O_acc.tolist(), error.tolist(),
+                                           L_plus.tolist(), L_minus.tolist(), alarm.tolist()):
+        slot = bank.slots[arb_id]
+        shift = None
+        if is_alarm:
+            shift = "Positive Shift" if result[2] > bank.threshold[slot] else "Negative Shift"
+        telemetry.record(arb_id, now, now - bank.start_time[slot], result, shift)
+
+def run_cids_bank(allowed_ids=None, id_params=None, queue_size=QUEUE_SIZE, drain_max=DRAIN_MAX, telemetry=None,
+                  checkpoint_path=None):
+    """Live loop on the ingest queue: every drain is followed by one vectorized tick"""
+    bus = get_bus(monitored_ids=allowed_ids)
+    bank = DetectorBank(allowed_ids=allowed_ids, id_params=id_params)
+    checkpointer = None
+    if checkpoint_path:
+        restore(bank, checkpoint_path)
+        checkpointer = Checkpointer(bank, checkpoint_path)
+    telemetry = telemetry or make_telemetry()
+    queue = FrameQueue(queue_size)
+    notifier = can.Notifier(bus, [queue])
+    print("CIDS Active (detector bank). Monitoring for both negative and positive shifts")
+
+    try:
+        while True:
+            for arb_id, timestamp in queue.drain(drain_max, timeout=1.0):
+                bank.add_frame(arb_id, timestamp)
+
+            now = time.time()
+            record_tick(bank, telemetry, now)
+            if checkpointer:
+                checkpointer.maybe_snapshot(now)
+    except KeyboardInterrupt:
+        print("CIDS stopped")
+    finally:
+        notifier.stop()
+        if checkpointer:
+            checkpointer.close()
+        telemetry.close()
+        bus.shutdown()
+
+if __name__ == "__main__":
+    parser = build_parser("CIDS live detector on a struct-of-arrays detector bank", registry_options=False)
+    parser.add_argument("--checkpoint", help="warm start from / snapshot to this file")
+    args = parser.parse_args()
+    configure_from_args(args)
+    run_cids_bank(args.ids, telemetry=make_telemetry(args), checkpoint_path=args.checkpoint)
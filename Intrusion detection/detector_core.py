@@ -0,0 +1,217 @@
+
+# Shared detector core for the live detector and the simulations.
+# The three original CIDS variants differ only in the interval the batch
+# offsets are measured against and in how sigma_e is handled, so those are
+# selectable per detector:
+#   reference="batch"    - the batch's own mean interval (live cids.py)
+#   reference="previous" - the previous batch's mean interval (Figure 6, Alg. 1)
+#   reference="baseline" - a baseline learned over the first batches (Figure 8)
+#   reference="nominal"  - the first batch's mean interval rounded to the nominal
+#                          period grid, so O_acc grows with the clock skew (ECU clustering)
+#   adaptive_sigma=True  - error mean/sigma follow the error (Figure 8)
+
+# PARAMETERS
+BATCH_SIZE = 20
+LAMBDA = 0.9995
+THRESHOLD = 5.0
+K_PARAM = 0.5
+SIGMA_E = 0.005
+
+REFERENCES = ("batch", "previous", "baseline", "nominal")
+NOMINAL_RESOLUTION = 0.001  # Nominal periods are whole milliseconds
+LEARNING_BATCHES = 200
+SUSPENSION_FAKE_INTERVAL = 10.0
+
+class CIDS:
+    __slots__ = (
+        # Parameters
+        "batch_size", "lam", "threshold", "k_param", "reference", "adaptive_sigma",
+        "learning_batches", "baseline_override",
+        # RLS / CUSUM state
+        "P", "S", "O_acc", "mu_e", "sigma_e", "L_plus", "L_minus",
+        # Timing state
+        "start_time", "period", "prev_mu_T", "baseline_mu_T", "batch_count", "learning_phase",
+        "reference_mu_T", "batch_buffer",
+    )
+
+    def __init__(self, batch_size=BATCH_SIZE, lam=LAMBDA, threshold=THRESHOLD, k_param=K_PARAM,
+                 sigma_e=SIGMA_E, reference="batch", adaptive_sigma=False,
+                 learning_batches=LEARNING_BATCHES, baseline_override=None):
+        """baseline_override: fixed interval used once the baseline learning phase ends"""
+        if reference not in REFERENCES:
+            raise ValueError(f"Unknown reference: {reference}")
+        self.batch_size = batch_size
+        self.lam = lam
+        self.threshold = threshold
+        self.k_param = k_param
+        self.reference = reference
+        self.adaptive_sigma = adaptive_sigma
+        self.learning_batches = learning_batches
+        self.baseline_override = baseline_override
+
+        self.P = 100.0      # Covariance
+        self.S = 0.0        # Skew (Slope)
+        self.O_acc = 0.0    # Accumulated Offset
+
+        # CUSUM Variables
+        self.mu_e = 0.0
+        self.sigma_e = sigma_e
+        self.L_plus = 0.0   # Upper Control Limit (Positive shifts)
+        self.L_minus = 0.0  # Lower Control Limit (Negative shifts)
+
+        self.start_time = None
+        self.period = None          # Mean interval of the last batch
+        self.prev_mu_T = None       # reference="previous"
+        self.baseline_mu_T = 0.0    # reference="baseline" / "nominal"
+        self.batch_count = 0
+        self.learning_phase = reference == "baseline"
+        self.reference_mu_T = None  # Interval the last batch was measured against
+        self.batch_buffer = []
+
+    def rls_update(self, t, error):
+        """Executes RLS update for Skew (S) and Covariance (P)"""
+        G = (self.P * t) / (self.lam + t * self.P * t)
+        self.P = (self.P - G * t * self.P) / self.lam
+        self.S = self.S + (G * error)
+
+    def update_statistics(self, error):
+        # Prevent updating stats on huge spikes
+        if self.sigma_e > 0:
+            z_score = abs((error - self.mu_e) / self.sigma_e)
+            if z_score >= 3.0:
+                return
+
+        alpha = 0.01
+        self.mu_e = (1 - alpha) * self.mu_e + alpha * error
+        var_e = self.sigma_e ** 2
+        var_e = (1 - alpha) * var_e + alpha * ((error - self.mu_e) ** 2)
+        self.sigma_e = max(var_e ** 0.5, 1e-6)
+
+    def check_cusum(self, error):
+        normalized = (error - self.mu_e) / self.sigma_e
+
+        # Update L+
+        self.L_plus = max(0, self.L_plus + normalized - self.k_param)
+
+        # Update L-
+        self.L_minus = max(0, self.L_minus - normalized - self.k_param)
+
+        return self.L_plus, self.L_minus
+
+    def reference_interval(self, current_mu_T):
+        """Interval the batch offsets are measured against (updates the reference state)"""
+        if self.reference == "previous":
+            reference_mu_T = self.prev_mu_T if self.prev_mu_T else current_mu_T
+            self.prev_mu_T = current_mu_T
+            return reference_mu_T
+
+        if self.reference == "baseline":
+            if self.learning_phase:
+                self.baseline_mu_T = ((self.baseline_mu_T * self.batch_count) + current_mu_T) / (self.batch_count + 1)
+                self.batch_count += 1
+                if self.batch_count > self.learning_batches:
+                    self.learning_phase = False
+                    if self.baseline_override is not None:
+                        self.baseline_mu_T = self.baseline_override
+            return current_mu_T if self.learning_phase else self.baseline_mu_T
+
+        if self.reference == "nominal":
+            if not self.baseline_mu_T:
+                self.baseline_mu_T = max(round(current_mu_T / NOMINAL_RESOLUTION), 1) * NOMINAL_RESOLUTION
+            return self.baseline_mu_T
+
+        return current_mu_T
+
+    def update(self, t_k, avg_offset):
+        """Accumulates one batch offset and runs statistics, CUSUM and RLS; returns the error"""
+        # Accumulated Offset
+        self.O_acc += abs(avg_offset)
+
+        # Identification Error
+        error = self.O_acc - (self.S * t_k)
+
+        if self.adaptive_sigma:
+            self.update_statistics(error)
+        self.check_cusum(error)
+        self.rls_update(t_k, error)
+        return error
+
+    def process_batch(self, batch_times, reference_mu_T=None):
+        """
+        Runs one batch through the detector and returns (O_acc, error).
+        reference_mu_T overrides the reference strategy for this batch.
+        """
+        N = len(batch_times)
+        if N < 2: return None
+
+        t0 = batch_times[0]
+        if self.start_time is None:
+            self.start_time = t0
+
+        # 1. Average Interval (the intervals telescope to last - first)
+        current_mu_T = (batch_times[-1] - t0) / (N - 1)
+        if reference_mu_T is None:
+            reference_mu_T = self.reference_interval(current_mu_T)
+        self.reference_mu_T = reference_mu_T
+        self.period = current_mu_T
+
+        # 2. Batch Offset: mean of t_i - (t0 + i * reference) for i = 1..N-1
+        acc = 0.0
+        for t in batch_times:
+            acc += t - t0
+        avg_offset = acc / (N - 1) - reference_mu_T * N / 2
+
+        # 3. Accumulated Offset, Identification Error, RLS & CUSUM
+        error = self.update(batch_times[-1] - self.start_time, avg_offset)
+        return self.O_acc, error
+
+    def add_frame(self, now):
+        """Buffers one arrival time, returns (O_acc, error, L+, L-) once a batch is complete"""
+        if self.start_time is None:
+            self.start_time = now
+        buf = self.batch_buffer
+        buf.append(now)
+
+        if len(buf) < self.batch_size:
+            return None
+
+        O_acc, error = self.process_batch(buf)
+        buf.clear()
+        return O_acc, error, self.L_plus, self.L_minus
+
+    def reset_batch(self):
+        """Drops the open batch, the next arrival starts a new one"""
+        self.batch_buffer.clear()
+
+    def process_suspension(self, now):
+        """Pads the open batch with huge intervals for the frames that never arrived (Alg. 1)"""
+        buf = self.batch_buffer
+        fake_time = now
+        for _ in range(self.batch_size - len(buf)):
+            fake_time += SUSPENSION_FAKE_INTERVAL
+            buf.append(fake_time)
+
+        # Offsets against the learned period (a padded batch is regular on its own),
+        # and the padded batch must not become the learned period
+        period = self.period
+        O_acc, error = self.process_batch(buf, reference_mu_T=period)
+        self.period = period
+        buf.clear()
+
+        return O_acc, error, self.L_plus, self.L_minus
+
+    def gap_deadline(self):
+        """Time from which the silence of this ID is a gap, None without a gap check (prefilter.py)"""
+        return None
+
+    def check_gap(self, now):
+        """Raises the gap alarm of a silent ID; returns the result to report, or None"""
+        return None
+
+    def alarm(self):
+        """Returns the direction of the detected shift, or None"""
+        if self.L_plus > self.threshold:
+            return "Positive Shift"
+        if self.L_minus > self.threshold:
+            return "Negative Shift"
+        return None
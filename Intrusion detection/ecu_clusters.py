@@ -0,0 +1,220 @@
+from detector_core import CIDS
+
+# ECU fingerprinting across IDs. Every ID first runs its own RLS on O_acc
+# against its nominal period (reference="nominal"), so its skew S is half the
+# clock skew of the sending ECU. Offsets are accumulated with their sign here:
+# the per-batch offset of a fast ID is dominated by jitter, and abs() would
+# turn that into a skew. Once clustered, every member runs its CUSUM against
+# the cluster skew, the fingerprint of its ECU.
+#
+# Signed O_acc is a random walk around S * t, so nothing is compared against
+# fixed tolerances. Every ID measures the spread of its message intervals,
+# which gives the variance of one batch offset (the arrivals are treated as a
+# random walk, the conservative case; a sender without jitter still has the
+# timestamp resolution JITTER_FLOOR). From it follow the standard error of the
+# ID's own skew estimate O_acc / t and of its skew over a window, and with them:
+#   - clustering: after the warm-up an ID joins a cluster on its coarse skew
+#     estimate (provisionally: a fast ID may need hours to tell ECUs a few ppm
+#     apart). The cluster skew is the inverse-variance weighted mean of its
+#     members' own estimates, refined on every member batch, so a new member
+#     uses a skew known to the precision of all of them at once. A member whose
+#     own estimate, as it gets better, moves more than REASSIGN_Z standard
+#     errors away from the other members is reassigned.
+#   - masquerade: a member whose own skew over a SKEW_WINDOW seconds window is
+#     more than DIVERGENCE_Z standard errors away from the cluster skew, for
+#     DIVERGENCE_WINDOWS windows in a row
+#   - CUSUM: the error is the deviation from the skew line since the start of
+#     the current window (bounded), not O_acc - S * t (a growing random walk)
+
+WARMUP_SECONDS = 60.0        # Own-RLS time before an ID is clustered
+WARMUP_BATCHES = 5           # ... and at least this many batches
+SKEW_RESOLUTION = 5e-5       # ... and until the standard error of its skew is this small (coarse)
+MERGE_Z = 2.5                # Standard errors within which an ID joins a cluster
+REASSIGN_Z = 4.0             # Standard errors between own and cluster skew that move a member
+SKEW_WINDOW = 30.0           # Seconds over which a member's own skew is measured
+DIVERGENCE_Z = 5.0           # Standard errors of a window skew that count as diverging
+DIVERGENCE_WINDOWS = 2       # Consecutive diverging windows before the alarm
+JITTER_FLOOR = 1e-6          # Interval jitter assumed at least (timestamp resolution), seconds
+
+class EcuCluster:
+    """One shared skew fingerprint for the IDs of one ECU: the pooled own estimates of its members"""
+    __slots__ = ("cluster_id", "S", "skew_var", "members", "updates")
+
+    def __init__(self, cluster_id):
+        self.cluster_id = cluster_id
+        self.S = 0.0
+        self.skew_var = float("inf")  # Variance of S
+        self.members = {}             # ClusteredCIDS -> its latest (S, skew_var)
+        self.updates = 0
+
+    def join(self, ids, S, skew_var):
+        self.members[ids] = (S, skew_var)
+        self.pool()
+
+    def leave(self, ids):
+        del self.members[ids]
+        self.pool()
+
+    def observe(self, ids, S, skew_var):
+        """Replaces the estimate of one member with its latest one"""
+        self.members[ids] = (S, skew_var)
+        self.pool()
+        self.updates += 1
+
+    def pool(self):
+        """Inverse-variance weighted mean of the members' estimates (independent jitter per ID)"""
+        self.S, self.skew_var = pooled(self.members.values())
+
+    def others(self, ids):
+        """The pooled estimate without ids, which is compared against it"""
+        return pooled(estimate for member, estimate in self.members.items() if member is not ids)
+
+def pooled(estimates):
+    sum_w = sum_wS = 0.0
+    for S, skew_var in estimates:
+        sum_w += 1.0 / skew_var
+        sum_wS += S / skew_var
+    if not sum_w:
+        return 0.0, float("inf")
+    return sum_wS / sum_w, 1.0 / sum_w
+
+class EcuClusters:
+    """Assigns warmed-up IDs to the cluster whose skew agrees within merge_z standard errors"""
+    def __init__(self, merge_z=MERGE_Z):
+        self.merge_z = merge_z
+        self.clusters = []
+
+    def assign(self, ids, S, skew_var):
+        best = None
+        best_z = self.merge_z
+        for cluster in self.clusters:
+            if not cluster.members:
+                continue
+            z = abs(cluster.S - S) / (cluster.skew_var + skew_var) ** 0.5
+            if z <= best_z:
+                best, best_z = cluster, z
+        if best is None:
+            best = EcuCluster(len(self.clusters))
+            self.clusters.append(best)
+        best.join(ids, S, skew_var)
+        ids.cluster = best
+        return best
+
+    def __len__(self):
+        return sum(1 for cluster in self.clusters if cluster.members)
+
+class ClusteredCIDS(CIDS):
+    """
+    Per-ID detector whose skew fingerprint is shared with the other IDs of its ECU.
+    clusters: the EcuClusters shared by all IDs of one registry
+    """
+    __slots__ = ("clusters", "cluster", "batches", "interval_ss", "interval_dof", "own_S", "own_var",
+                 "anchor_t", "anchor_O", "window_batches", "diverging", "masquerade", "reassigned")
+
+    def __init__(self, clusters, **params):
+        params.setdefault("reference", "nominal")
+        super().__init__(**params)
+        self.clusters = clusters
+        self.cluster = None
+        self.batches = 0        # Real batches since the start
+        self.interval_ss = 0.0  # Squared interval deviations from the batch means
+        self.interval_dof = 0
+        self.own_S = None       # Skew over the last SKEW_WINDOW, compared with the cluster
+        self.own_var = 0.0      # ... and its variance
+        self.anchor_t = 0.0
+        self.anchor_O = 0.0
+        self.window_batches = 0
+        self.diverging = 0
+        self.masquerade = False
+        self.reassigned = 0
+
+    def process_batch(self, batch_times, reference_mu_T=None):
+        # Interval jitter is measured on real batches (not on padded ones)
+        if reference_mu_T is None and len(batch_times) > 2:
+            self.measure_jitter(batch_times)
+            self.batches += 1
+        return super().process_batch(batch_times, reference_mu_T)
+
+    def measure_jitter(self, batch_times):
+        N = len(batch_times)
+        mu_T = (batch_times[-1] - batch_times[0]) / (N - 1)
+        ss = 0.0
+        prev = batch_times[0]
+        for i in range(1, N):
+            t = batch_times[i]
+            d = t - prev - mu_T
+            ss += d * d
+            prev = t
+        self.interval_ss += ss
+        self.interval_dof += N - 2
+
+    def offset_var(self):
+        """Variance of one batch offset: mean of N arrivals that each add one interval's jitter"""
+        interval_var = self.interval_ss / self.interval_dof if self.interval_dof else 0.0
+        N = self.batch_size
+        return max(interval_var, JITTER_FLOOR ** 2) * N * (2 * N - 1) / (6 * (N - 1))
+
+    def skew_estimate(self, t_k):
+        """Own skew O_acc / t and its variance (O_acc is a random walk of batch offsets around S * t,
+        so this is its least-squares skew)"""
+        return self.O_acc / t_k, max(self.batches, 1) * self.offset_var() / (t_k * t_k)
+
+    def update(self, t_k, avg_offset):
+        # Accumulated (signed) Offset
+        self.O_acc += avg_offset
+        self.window_batches += 1
+        cluster = self.cluster
+        S = self.S if cluster is None else cluster.S
+
+        # Identification Error against the skew line since the window start
+        error = self.O_acc - self.anchor_O - S * (t_k - self.anchor_t)
+        if self.adaptive_sigma:
+            self.update_statistics(error)
+        self.check_cusum(error)
+        window_done = self.track_skew(t_k)
+
+        if cluster is None:
+            # Warm-up: own RLS until the coarse skew estimate is good enough to cluster on
+            self.rls_update(t_k, self.O_acc - S * t_k)
+            if self.batches >= WARMUP_BATCHES and t_k >= WARMUP_SECONDS:
+                S_est, skew_var = self.skew_estimate(t_k)
+                if skew_var <= SKEW_RESOLUTION ** 2:
+                    self.clusters.assign(self, S_est, skew_var)
+                    self.S = self.cluster.S
+            return error
+
+        S_est, skew_var = self.skew_estimate(t_k)
+        if window_done:
+            limit = DIVERGENCE_Z * (self.own_var + cluster.skew_var) ** 0.5
+            if abs(self.own_S - cluster.S) > limit:
+                self.diverging += 1
+            else:
+                self.diverging = 0
+                # Provisional membership: the own estimate has moved away from the other members
+                S_others, var_others = cluster.others(self)
+                if abs(S_est - S_others) > REASSIGN_Z * (skew_var + var_others) ** 0.5:
+                    cluster.leave(self)
+                    cluster = self.clusters.assign(self, S_est, skew_var)
+                    self.reassigned += 1
+            self.masquerade = self.diverging >= DIVERGENCE_WINDOWS
+        if not self.diverging:
+            cluster.observe(self, S_est, skew_var)
+        self.S = cluster.S
+        return error
+
+    def track_skew(self, t_k):
+        """Updates own_S (and its variance) once per SKEW_WINDOW; returns True when it did"""
+        dt = t_k - self.anchor_t
+        if dt < SKEW_WINDOW:
+            return False
+        self.own_S = (self.O_acc - self.anchor_O) / dt
+        self.own_var = self.window_batches * self.offset_var() / (dt * dt)
+        self.anchor_t = t_k
+        self.anchor_O = self.O_acc
+        self.window_batches = 0
+        return True
+
+    def alarm(self):
+        if self.masquerade:
+            return "Masquerade"
+        return super().alarm()
@@ -0,0 +1,221 @@
+
+import argparse
+import heapq
+import sys
+import time
+from bus_config import get_bus
+from cids import run_cids
+from detector_bank import DetectorBank, record_tick
+from victim import victim_frames
+from attack_fabrication import attack_frames, WARMUP
+
+# End-to-end harness: victim, attacker and the run_cids loop in one process on
+# a virtual clock. The senders share one bus and the detector has its own, on
+# one channel of python-can's in-process "virtual" interface (preserve_timestamps,
+# so frames carry the virtual send time), so frames go through the same
+# python-can send/receive and ID filtering as on a real bus. When the detector
+# waits in bus.recv(timeout), the harness runs the senders' schedule up to the
+# next frame or the timeout instead of sleeping: a 400 s scenario takes a few
+# seconds, and the result is the same on every run.
+#
+# With --bank the detector is the struct-of-arrays DetectorBank instead: every
+# BANK_TICK virtual seconds the harness sends the frames scheduled up to then,
+# receives them through the same bus and filters, and hands them to the bank
+# for one vectorized tick, which takes the per-frame detector work (registry,
+# deadlines) off the frame path.
+#
+# What remains per frame is python-can's virtual interface: it deep-copies
+# every frame and passes it through a locked queue, 13-19 us per frame on its
+# own, which caps the 500 frames/s flood at about 130-150x real time. The
+# senders reuse their message objects (python-can copies them on send), and
+# the flood runs at 110-140x in either mode on an idle machine, less on a
+# loaded one. The victim alone (20 frames/s) runs at over 1000x.
+
+HARNESS_CHANNEL = "cids_harness"
+DURATION = 400.0
+BANK_TICK = 0.1   # Virtual seconds of frames per detector bank tick
+
+class ScenarioEnd(Exception):
+    """Raised by the detector's bus once the scenario is over; ends run_cids"""
+
+class VirtualClock:
+    def __init__(self, start=0.0):
+        self.now = start
+
+    def __call__(self):
+        return self.now
+
+class ScheduledBus:
+    """
+    The detector's bus. recv(timeout) advances the virtual clock by sending the
+    scheduled frames (time order, heap merged) until one is received or the
+    timeout has passed.
+    """
+    def __init__(self, bus, sender_bus, clock, senders, end):
+        self.bus = bus
+        self.sender_bus = sender_bus
+        self.clock = clock
+        self.end = end
+        self.events = []   # (send time, sender index, message, frames)
+        self.pending = 0   # Frames sent but not yet received
+        self.sent = 0
+        for i, frames in enumerate(senders):
+            self._schedule(i, frames)
+
+    def _schedule(self, i, frames):
+        for send_time, msg in frames:
+            heapq.heappush(self.events, (send_time, i, msg, frames))
+            return
+
+    def recv(self, timeout=None):
+        clock = self.clock
+        deadline = None if timeout is None else clock.now + timeout
+        while True:
+            # recv(0) takes at most one frame, and frames outside the filters yield None
+            while self.pending:
+                self.pending -= 1
+                msg = self.bus.recv(0)
+                if msg is not None:
+                    return msg
+            if not self.events or self.events[0][0] >= self.end:
+                raise ScenarioEnd
+            send_time, i, msg, frames = self.events[0]
+            if deadline is not None and send_time > deadline:
+                clock.now = deadline
+                return None
+
+            heapq.heappop(self.events)
+            clock.now = send_time
+            msg.timestamp = send_time
+            self.sender_bus.send(msg)
+            self.pending += 1
+            self.sent += 1
+            self._schedule(i, frames)
+
+    def recv_until(self, until):
+        """
+        Sends every frame scheduled before until (at most the end of the scenario),
+        advances the clock to it and returns the frames received (outside the filters: not returned).
+        """
+        events = self.events
+        if not events or events[0][0] >= self.end:
+            raise ScenarioEnd
+        until = min(until, self.end)
+        send = self.sender_bus.send
+        sent = 0
+        while events and events[0][0] < until:
+            send_time, i, msg, frames = heapq.heappop(events)
+            msg.timestamp = send_time
+            send(msg)
+            sent += 1
+            self._schedule(i, frames)
+        self.sent += sent
+        self.clock.now = until
+
+        recv = self.bus.recv
+        received = [recv(0) for _ in range(sent)]
+        return [msg for msg in received if msg is not None]
+
+    def shutdown(self):
+        self.sender_bus.shutdown()
+        self.bus.shutdown()
+
+class RecordingTelemetry:
+    """Keeps every batch in memory for the checks (no files, no console output)"""
+    def __init__(self):
+        self.batches = []
+        self.dropped = 0
+        self.dropped_alarms = 0
+
+    def record(self, arb_id, now, time_sec, result, shift=None, suspended=False):
+        self.batches.append((arb_id, now, time_sec, result, shift, suspended))
+
+    def alarms(self):
+        return [(arb_id, now, shift) for arb_id, now, _, _, shift, _ in self.batches if shift is not None]
+
+    def close(self):
+        pass
+
+def virtual_bus(channel=HARNESS_CHANNEL, **config):
+    return get_bus(interface="virtual", channel=channel, preserve_timestamps=True, **config)
+
+def scenario_bus(duration, attack_start, attack, allowed_ids, channel):
+    """Victim (0x11 every 50 ms) from t=0 and, if attack, the fabrication flood from attack_start"""
+    clock = VirtualClock()
+    senders = [victim_frames(0.0)]
+    if attack:
+        senders.append(attack_frames(attack_start))
+    detector_bus = virtual_bus(channel, monitored_ids=allowed_ids)
+    return ScheduledBus(detector_bus, virtual_bus(channel), clock, senders, duration)
+
+def run_scenario(duration=DURATION, attack_start=WARMUP, attack=True, allowed_ids=None,
+                 channel=HARNESS_CHANNEL, **options):
+    """
+    The scenario (see scenario_bus) through run_cids for `duration` virtual seconds.
+    options: run_cids options (every, prefilter, ecu_clusters, ...)
+    Returns (RecordingTelemetry, frames sent, wall-clock seconds).
+    """
+    bus = scenario_bus(duration, attack_start, attack, allowed_ids, channel)
+    telemetry = RecordingTelemetry()
+
+    start = time.perf_counter()
+    try:
+        run_cids(allowed_ids, telemetry=telemetry, bus=bus, clock=bus.clock, **options)
+    except ScenarioEnd:
+        pass  # run_cids has shut the buses down
+    return telemetry, bus.sent, time.perf_counter() - start
+
+def run_bank_scenario(duration=DURATION, attack_start=WARMUP, attack=True, allowed_ids=None,
+                      channel=HARNESS_CHANNEL, tick=BANK_TICK):
+    """The scenario through a DetectorBank, one tick per `tick` virtual seconds; returns as run_scenario"""
+    bus = scenario_bus(duration, attack_start, attack, allowed_ids, channel)
+    bank = DetectorBank(allowed_ids=allowed_ids)
+    telemetry = RecordingTelemetry()
+
+    start = time.perf_counter()
+    try:
+        while True:
+            for msg in bus.recv_until(bus.clock.now + tick):
+                bank.add_frame(msg.arbitration_id, msg.timestamp)
+            record_tick(bank, telemetry, bus.clock.now)
+    except ScenarioEnd:
+        pass
+    finally:
+        bus.shutdown()
+    return telemetry, bus.sent, time.perf_counter() - start
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Victim, attacker and detector on a virtual clock")
+    parser.add_argument("--duration", type=float, default=DURATION, help="virtual seconds")
+    parser.add_argument("--attack-start", type=float, default=WARMUP)
+    parser.add_argument("--no-attack", action="store_true", help="victim only (false alarm check)")
+    parser.add_argument("--ids", nargs="+", type=lambda x: int(x, 0), help="detector allow-list")
+    parser.add_argument("--every", type=int)
+    parser.add_argument("--prefilter", action="store_true")
+    parser.add_argument("--bank", action="store_true",
+                        help=f"detector bank fed every {BANK_TICK} virtual seconds instead of run_cids")
+    args = parser.parse_args()
+
+    if args.bank:
+        if args.every or args.prefilter:
+            parser.error("--every and --prefilter are run_cids options, not available with --bank")
+        telemetry, sent, elapsed = run_bank_scenario(args.duration, args.attack_start, not args.no_attack, args.ids)
+    else:
+        telemetry, sent, elapsed = run_scenario(args.duration, args.attack_start, not args.no_attack, args.ids,
+                                                every=args.every, prefilter=args.prefilter)
+    alarms = telemetry.alarms()
+    print(f"{sent} frames, {len(telemetry.batches)} batches in {elapsed:.2f}s "
+          f"({args.duration / elapsed:.0f}x real time)")
+    if alarms:
+        arb_id, now, shift = alarms[0]
+        print(f"First alarm: 0x{arb_id:X} {shift} at t={now:.3f}s "
+              f"({now - args.attack_start:+.3f}s after the attack start), {len(alarms)} alarm batches")
+    else:
+        print("No alarms")
+
+    # Exit status for CI: the attack must be detected, and only after it started
+    early = [now for _, now, _ in alarms if args.no_attack or now < args.attack_start]
+    if early or (not args.no_attack and not alarms):
+        print("❌ Unexpected result")
+        sys.exit(1)
+    print("✅ As expected")
@@ -0,0 +1,119 @@
+
+import threading
+import time
+from collections import deque
+import can
+from bus_config import get_bus, configure_from_args
+from checkpoint import Checkpointer
+from cids import (DeadlineScheduler, make_registry, make_metrics, make_telemetry, handle_frame,
+                  handle_deadlines, build_parser)
+
+# Ingest pipeline: a can.Notifier thread only receives frames and puts
+# (arbitration ID, receive timestamp) into a bounded queue; the detection loop
+# drains the queue in bulk. A slow detection or output step then fills the
+# queue instead of backing up the socket.
+
+QUEUE_SIZE = 65536
+DRAIN_MAX = 1024        # Frames handled per drain
+STATS_INTERVAL = 5.0    # Seconds between queue depth / drop reports
+
+class FrameQueue(can.Listener):
+    """Bounded single-producer/single-consumer frame queue, drops new frames when full"""
+    def __init__(self, maxsize=QUEUE_SIZE):
+        self.maxsize = maxsize
+        self.frames = deque()
+        self.ready = threading.Event()
+        self.received = 0
+        self.dropped = 0
+        self.max_depth = 0
+
+    def on_message_received(self, msg):
+        self.received += 1
+        frames = self.frames
+        if len(frames) >= self.maxsize:
+            self.dropped += 1
+            return
+        frames.append((msg.arbitration_id, msg.timestamp))
+        self.ready.set()
+
+    def on_error(self, exc):
+        print(f"Receive error: {exc}")
+
+    def drain(self, max_frames=DRAIN_MAX, timeout=None):
+        """Returns up to max_frames queued frames, waiting up to timeout if there are none"""
+        self.ready.clear()
+        frames = self.frames
+        if not frames:
+            self.ready.wait(timeout)
+        
+        n = min(len(frames), max_frames)
+        self.max_depth = max(self.max_depth, len(frames))
+        popleft = frames.popleft
+        return [popleft() for _ in range(n)]
+
+    def __len__(self):
+        return len(self.frames)
+
+def run_cids_pipelined(allowed_ids=None, id_params=None, every=None, checkpoint_path=None,
+                       queue_size=QUEUE_SIZE, drain_max=DRAIN_MAX, stats_interval=STATS_INTERVAL,
+                       telemetry=None, metrics_port=None, ecu_clusters=False, pmf=False,
+                       prefilter=False):
+    bus = get_bus(monitored_ids=allowed_ids)
+    telemetry = telemetry or make_telemetry()
+    metrics = make_metrics(metrics_port, telemetry)
+    registry = make_registry(allowed_ids, id_params, every, checkpoint_path, metrics, ecu_clusters, pmf,
+                             prefilter)
+    scheduler = DeadlineScheduler()
+    checkpointer = Checkpointer(registry, checkpoint_path) if checkpoint_path else None
+    queue = FrameQueue(queue_size)
+    if metrics:
+        metrics.gauge("cids_frames_received_total", "Frames received by the ingest queue",
+                      lambda: queue.received, "counter")
+        metrics.gauge("cids_frames_dropped_total", "Frames dropped by the full ingest queue",
+                      lambda: queue.dropped, "counter")
+        metrics.gauge("cids_queue_depth", "Frames waiting in the ingest queue", lambda: len(queue))
+        metrics.gauge("cids_pending_deadlines", "IDs waiting for their suspension deadline", lambda: len(scheduler))
+    notifier = can.Notifier(bus, [queue])
+    
+    next_stats = time.time() + stats_interval
+    try:
+        while True:
+            next_deadline = scheduler.next_deadline()
+            timeout = stats_interval if next_deadline is None else max(0.0, next_deadline - time.time())
+            
+            # Detection works on the receive timestamps, not on when the frame is drained
+            frames = queue.drain(drain_max, timeout)
+            for arb_id, timestamp in frames:
+                handle_frame(registry, scheduler, telemetry, arb_id, timestamp)
+            
+            # With a backlog, deadlines are checked against the last handled frame,
+            # otherwise frames still in the queue would look like missed deadlines
+            # (frames may be empty even if the queue is not: a frame can arrive after drain)
+            now = time.time()
+            handle_deadlines(registry, scheduler, telemetry, frames[-1][1] if frames and len(queue) else now)
+            if checkpointer:
+                checkpointer.maybe_snapshot(now)
+            
+            if now >= next_stats:
+                print(f"Queue depth: {len(queue)} (max {queue.max_depth}) | "
+                      f"received: {queue.received} | dropped: {queue.dropped} | "
+                      f"telemetry dropped: {telemetry.dropped}")
+                queue.max_depth = 0
+                next_stats = now + stats_interval
+    except KeyboardInterrupt:
+        print("CIDS stopped")
+    finally:
+        notifier.stop()
+        if checkpointer:
+            checkpointer.close()
+        telemetry.close()
+        bus.shutdown()
+
+if __name__ == "__main__":
+    parser = build_parser("CIDS live detector with a bounded ingest queue")
+    parser.add_argument("--queue-size", type=int, default=QUEUE_SIZE)
+    args = parser.parse_args()
+    configure_from_args(args)
+    run_cids_pipelined(args.ids, every=args.every, checkpoint_path=args.checkpoint, queue_size=args.queue_size,
+                       telemetry=make_telemetry(args), metrics_port=args.metrics_port,
+                       ecu_clusters=args.ecu_clusters, pmf=args.pmf, prefilter=args.prefilter)
@@ -0,0 +1,172 @@
+
+import math
+import numpy as np
+
+# Streaming interval histograms (PMF fingerprints). Fixed bins over
+# [low, high) plus an underflow and an overflow bin, counted in a uint32 array:
+# add() is O(1) and memory is a few hundred bytes per ID however long it runs.
+# With half_life the counts are halved every half_life inserts, so the
+# histogram follows the recent intervals (exponential decay in integer steps).
+#
+# with_pmf() adds the PMF as an extra masquerade signal to a detector class.
+# The baseline PMF is learned for PMF_BASELINE_SECONDS (longer if the ID has
+# not sent PMF_MIN_SAMPLES intervals by then, shorter once it has
+# PMF_BASELINE), from clean intervals only: intervals outside the bin range
+# and intervals that arrive while the detector is in alarm (CUSUM, prefilter
+# flood/gap) are left out, so a flood during learning does not become the
+# baseline. After that a decaying histogram of the recent intervals is compared
+# with it by total variation distance every PMF_CHECK_EVERY intervals.
+# Padded suspension arrivals never reach the histograms, and the first real
+# frame after a suspension starts a new interval.
+#
+# PMF_THRESHOLD is calibrated on the Figure 8 masquerade: the attacker's clock
+# moves the 50 ms period by 9.5 us against 50 us jitter, a distance of 0.075 -
+# 0.10 once the recent PMF has turned over. Without the attack the distance is
+# only sampling noise (4,000 baseline and 2,000-4,000 recent intervals) and
+# stayed below 0.05 in 3,000 s runs, so the alarm is raised at 0.06.
+
+PMF_BINS = 59            # Bins of Figure 8 (48.5 - 51.5 ms)
+PMF_SPREAD = 0.03        # Bin range: period +- 3%
+PMF_BASELINE = 4000      # Intervals in the baseline PMF (at most)
+PMF_BASELINE_SECONDS = 200.0  # Learning time of the baseline PMF
+PMF_HALF_LIFE = 2000     # Inserts between two halvings of the recent PMF
+PMF_CHECK_EVERY = 100    # Intervals between two distance checks
+PMF_MIN_SAMPLES = 1000   # Baseline and recent intervals needed before the first check
+PMF_THRESHOLD = 0.06     # Total variation distance that raises the alarm (see above)
+
+class IntervalHistogram:
+    __slots__ = ("low", "high", "n_bins", "width", "counts", "total", "half_life", "since_decay")
+
+    def __init__(self, low, high, n_bins=PMF_BINS, half_life=None):
+        self.low = low
+        self.high = high
+        self.n_bins = n_bins
+        self.width = (high - low) / n_bins
+        self.counts = np.zeros(n_bins + 2, dtype=np.uint32)  # [underflow, bins..., overflow]
+        self.total = 0
+        self.half_life = half_life
+        self.since_decay = 0
+
+    @classmethod
+    def for_period(cls, period, spread=PMF_SPREAD, n_bins=PMF_BINS, half_life=None):
+        """Bins centered on the period of an ID"""
+        return cls(period * (1 - spread), period * (1 + spread), n_bins, half_life)
+
+    def like(self, half_life=None):
+        """Empty histogram with the same bins"""
+        return IntervalHistogram(self.low, self.high, self.n_bins, half_life)
+
+    def add(self, value):
+        i = math.floor((value - self.low) / self.width) + 1
+        if i < 1:
+            i = 0
+        elif i > self.n_bins:
+            i = self.n_bins + 1
+        self.counts[i] += 1
+        self.total += 1
+
+        if self.half_life:
+            self.since_decay += 1
+            if self.since_decay >= self.half_life:
+                self.counts >>= 1
+                self.total = int(self.counts.sum())
+                self.since_decay = 0
+
+    def extend(self, values):
+        """Adds many values at once (no decay in between)"""
+        i = np.floor((np.asarray(values) - self.low) / self.width).astype(np.int64) + 1
+        np.clip(i, 0, self.n_bins + 1, out=i)
+        self.counts += np.bincount(i, minlength=self.n_bins + 2).astype(np.uint32)
+        self.total += len(i)
+
+    @property
+    def edges(self):
+        return np.linspace(self.low, self.high, self.n_bins + 1)
+
+    def pmf(self):
+        """Probability per bin, including the underflow and overflow bins"""
+        if self.total == 0:
+            return np.zeros(len(self.counts))
+        return self.counts / self.total
+
+    def density(self):
+        """Density over the in-range bins (as np.histogram(..., density=True))"""
+        inside = self.counts[1:-1]
+        n = inside.sum()
+        if n == 0:
+            return np.zeros(self.n_bins)
+        return inside / (n * self.width)
+
+    def distance(self, other):
+        """Total variation distance to a histogram with the same bins (0 = same, 1 = disjoint)"""
+        return 0.5 * float(np.abs(self.pmf() - other.pmf()).sum())
+
+def with_pmf(detector_cls):
+    """Subclass of detector_cls that also raises "PMF Shift" when the interval PMF changes"""
+    base_add_frame = detector_cls.add_frame
+    base_alarm = detector_cls.alarm
+    base_process_suspension = detector_cls.process_suspension
+
+    class PmfDetector(detector_cls):
+        __slots__ = ("pmf_last_arrival", "baseline_pmf", "baseline_end", "recent_pmf", "pmf_distance",
+                     "pmf_alarm", "since_check", "pmf_suspending")
+
+        def __init__(self, *args, **params):
+            detector_cls.__init__(self, *args, **params)
+            self.pmf_last_arrival = None
+            self.baseline_pmf = None
+            self.baseline_end = None   # Learning time is up after this arrival time
+            self.recent_pmf = None
+            self.pmf_distance = 0.0
+            self.pmf_alarm = False
+            self.since_check = 0
+            self.pmf_suspending = False
+
+        def add_frame(self, now):
+            if self.pmf_suspending:
+                return base_add_frame(self, now)
+            last = self.pmf_last_arrival
+            self.pmf_last_arrival = now
+            # Bins are placed once the first batch has given the period
+            if last is not None and self.period:
+                self.add_interval(now - last, now)
+            return base_add_frame(self, now)
+
+        def add_interval(self, interval, now):
+            baseline = self.baseline_pmf
+            if baseline is None:
+                baseline = self.baseline_pmf = IntervalHistogram.for_period(self.period)
+                self.baseline_end = now + PMF_BASELINE_SECONDS
+            if self.recent_pmf is None:
+                # Learning: only clean intervals inside the bin range
+                if baseline.low <= interval < baseline.high and self.alarm() is None:
+                    baseline.add(interval)
+                if baseline.total < PMF_BASELINE and (now < self.baseline_end or baseline.total < PMF_MIN_SAMPLES):
+                    return
+                self.recent_pmf = baseline.like(PMF_HALF_LIFE)
+                return
+
+            recent = self.recent_pmf
+            recent.add(interval)
+            self.since_check += 1
+            if self.since_check >= PMF_CHECK_EVERY and recent.total >= PMF_MIN_SAMPLES:
+                self.since_check = 0
+                self.pmf_distance = baseline.distance(recent)
+                self.pmf_alarm = self.pmf_distance > PMF_THRESHOLD
+
+        def process_suspension(self, now):
+            # Padded arrivals are no intervals, and neither is the silence up to the next real frame
+            self.pmf_suspending = True
+            try:
+                return base_process_suspension(self, now)
+            finally:
+                self.pmf_suspending = False
+                self.pmf_last_arrival = None
+
+        def alarm(self):
+            if self.pmf_alarm:
+                return "PMF Shift"
+            return base_alarm(self)
+
+    PmfDetector.__name__ = f"Pmf{detector_cls.__name__}"
+    return PmfDetector
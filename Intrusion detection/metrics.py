@@ -0,0 +1,216 @@
+
+import threading
+import time
+from bisect import bisect_left
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Instrumentation of the live detector, served in the Prometheus text format
+# (GET http://127.0.0.1:9108/metrics). The detection thread only increments
+# counters in the detector objects; stage times of every SAMPLE_EVERY-th batch
+# go into fixed-bucket histograms. Per-ID values and gauges (L+/L-, queue
+# depth, ...) are read when the endpoint is scraped, so nothing is formatted
+# on the hot path.
+
+METRICS_PORT = 9108
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Seconds, for per-batch stage times (a batch takes a few microseconds)
+STAGE_BUCKETS = (1e-6, 2.5e-6, 5e-6, 1e-5, 2.5e-5, 5e-5, 1e-4, 2.5e-4, 1e-3, 1e-2)
+STAGES = ("batch", "interval_offset", "cusum", "rls")
+SAMPLE_EVERY = 16  # Batches between two timed batches
+
+class Histogram:
+    """Cumulative-bucket histogram with O(log buckets) observe"""
+    def __init__(self, buckets=STAGE_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)  # Last slot is +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def lines(self, name, labels):
+        out = []
+        cumulative = 0
+        for bound, count in zip(self.buckets + ("+Inf",), self.counts):
+            cumulative += count
+            out.append(f'{name}_bucket{{{labels},le="{bound}"}} {cumulative}')
+        out.append(f"{name}_sum{{{labels}}} {self.sum}")
+        out.append(f"{name}_count{{{labels}}} {self.count}")
+        return out
+
+class Metrics:
+    """
+    Metrics of one DetectorRegistry. The registry's detectors must be created from
+    instrument(detector_cls) to count frames, batches and alarms per ID and time
+    the stages. frames (all IDs, monitored or not) is counted by the receive loop.
+    """
+    def __init__(self, registry=None, sample_every=SAMPLE_EVERY):
+        self.registry = registry
+        self.stages = {stage: Histogram() for stage in STAGES}
+        self.sample_every = sample_every
+        self.countdown = sample_every
+        self.timing = False
+        self.frames = 0
+        self.gauges = []   # (name, help, type, fn), fn() is called on every scrape
+        self.classes = {}
+        self.started = time.time()
+
+    def gauge(self, name, help_text, fn, kind="gauge"):
+        """Registers a value that is read on scrape, e.g. the ingest queue depth"""
+        self.gauges.append((name, help_text, kind, fn))
+
+    def instrument(self, detector_cls):
+        """Subclass of detector_cls that reports into these metrics"""
+        cls = self.classes.get(detector_cls)
+        if cls is None:
+            cls = _instrumented(detector_cls, self)
+            self.classes[detector_cls] = cls
+        return cls
+
+    def render(self):
+        lines = []
+        def family(name, help_text, kind):
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+
+        # Snapshot without holding up the detection thread (the dict copy is atomic)
+        detectors = list(self.registry.detectors.items()) if self.registry is not None else []
+        per_id = (
+            ("cids_id_frames_total", "Frames received per arbitration ID (rate() gives frames/s)", "counter", "frames"),
+            ("cids_batches_processed_total", "Batches evaluated per arbitration ID", "counter", "batches"),
+            ("cids_alarm_batches_total", "Batches in alarm per arbitration ID", "counter", "alarms"),
+            ("cids_l_plus", "Current upper CUSUM limit L+", "gauge", "L_plus"),
+            ("cids_l_minus", "Current lower CUSUM limit L-", "gauge", "L_minus"),
+            ("cids_skew", "Current RLS clock skew estimate", "gauge", "S"),
+            ("cids_pmf_distance", "Interval PMF distance to the baseline (with --pmf)", "gauge", "pmf_distance"),
+        )
+        for name, help_text, kind, attr in per_id:
+            family(name, help_text, kind)
+            for arb_id, ids in detectors:
+                lines.append(f'{name}{{id="0x{arb_id:X}"}} {getattr(ids, attr, 0)}')
+
+        family("cids_monitored_ids", "Arbitration IDs with a detector", "gauge")
+        lines.append(f"cids_monitored_ids {len(detectors)}")
+
+        family("cids_stage_seconds", "Processing time per batch and stage", "histogram")
+        for stage, histogram in self.stages.items():
+            lines.extend(histogram.lines("cids_stage_seconds", f'stage="{stage}"'))
+
+        for name, help_text, kind, fn in self.gauges:
+            family(name, help_text, kind)
+            lines.append(f"{name} {fn()}")
+
+        family("cids_uptime_seconds", "Seconds since the detector started", "gauge")
+        lines.append(f"cids_uptime_seconds {time.time() - self.started:.3f}")
+        return "\n".join(lines) + "\n"
+
+def _instrumented(detector_cls, metrics):
+    perf_ns = time.perf_counter_ns
+    stages = metrics.stages
+    # Base methods bound once, cheaper than super() on every batch
+    base_update = detector_cls.update
+    base_check_cusum = detector_cls.check_cusum
+    base_rls_update = detector_cls.rls_update
+    base_add_frame = detector_cls.add_frame
+    base_process_suspension = detector_cls.process_suspension
+
+    class Instrumented(detector_cls):
+        __slots__ = ("frames", "batches", "alarms", "update_ns")
+
+        def __init__(self, *args, **params):
+            detector_cls.__init__(self, *args, **params)
+            self.frames = 0
+            self.batches = 0
+            self.alarms = 0
+            self.update_ns = 0
+
+        def add_frame(self, now):
+            self.frames += 1
+            return base_add_frame(self, now)
+
+        def process_suspension(self, now):
+            # Padded arrivals (IncrementalCIDS pushes them through add_frame) are not frames
+            frames = self.frames
+            result = base_process_suspension(self, now)
+            self.frames = frames
+            return result
+
+        def _timed_batch(self, method, *args):
+            # Only every sample_every-th batch is timed, the rest pays one counter
+            metrics.countdown -= 1
+            if metrics.countdown > 0:
+                return method(self, *args)
+            metrics.countdown = metrics.sample_every
+            metrics.timing = True
+            t0 = perf_ns()
+            result = method(self, *args)
+            total = perf_ns() - t0
+            metrics.timing = False
+            # Everything before update() is interval / offset
+            stages["batch"].observe(total * 1e-9)
+            stages["interval_offset"].observe((total - self.update_ns) * 1e-9)
+            return result
+
+        def process_batch(self, batch_times, reference_mu_T=None):
+            return self._timed_batch(detector_cls.process_batch, batch_times, reference_mu_T)
+
+        if hasattr(detector_cls, "evaluate"):
+            def evaluate(self, t):
+                return self._timed_batch(detector_cls.evaluate, t)
+
+        def update(self, t_k, avg_offset):
+            self.batches += 1
+            if metrics.timing:
+                t0 = perf_ns()
+                error = base_update(self, t_k, avg_offset)
+                self.update_ns = perf_ns() - t0
+            else:
+                error = base_update(self, t_k, avg_offset)
+            if self.alarm():
+                self.alarms += 1
+            return error
+
+        def check_cusum(self, error):
+            if not metrics.timing:
+                return base_check_cusum(self, error)
+            t0 = perf_ns()
+            result = base_check_cusum(self, error)
+            stages["cusum"].observe((perf_ns() - t0) * 1e-9)
+            return result
+
+        def rls_update(self, t, error):
+            if not metrics.timing:
+                return base_rls_update(self, t, error)
+            t0 = perf_ns()
+            base_rls_update(self, t, error)
+            stages["rls"].observe((perf_ns() - t0) * 1e-9)
+
+    Instrumented.__name__ = f"Instrumented{detector_cls.__name__}"
+    return Instrumented
+
+def serve(metrics, port=METRICS_PORT, host="127.0.0.1"):
+    """Serves GET /metrics from a daemon thread; returns the server (call .shutdown() to stop)"""
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?")[0] not in ("/metrics", "/"):
+                self.send_error(404)
+                return
+            body = metrics.render().encode()
+            self.send_response(200)
+            self.send_header("Content-Type", CONTENT_TYPE)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass  # No per-scrape output
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    print(f"Metrics on http://{host}:{server.server_address[1]}/metrics")
+    return server
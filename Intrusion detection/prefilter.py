@@ -0,0 +1,139 @@
+
+# Two-tier detection. Tier 1 runs on every frame in O(1): a token bucket per ID
+# that is refilled at the learned rate (one token per learned period, at most
+# PREFILTER_BURST tokens), and every arrival takes one token. A flood empties
+# the bucket within a few frames and raises "Flood" until PREFILTER_BURST
+# intervals in a row are back near the learned period. An ID that stays silent
+# for GAP_PERIODS learned periods raises "Gap": the check runs from the deadline
+# path (cids.handle_deadlines), so it also fires when no frame ever comes back,
+# and the next frame clears it. Tier 2 is the clock-skew pipeline
+# (batch offsets, RLS, CUSUM) for the subtle attacks. While an ID is flooded,
+# tier 2 only runs one full batch out of every PREFILTER_SAMPLE batches.
+#
+# The learned period is taken from the first batch and then follows the batch
+# periods slowly, only while they stay within PERIOD_TOLERANCE of it, so a
+# flood can not teach the bucket its own rate.
+
+PREFILTER_BURST = 4.0     # Bucket size in frames (absorbs jitter and late/early pairs)
+GAP_PERIODS = 3.0         # Interval (in learned periods) that counts as a gap
+PERIOD_TOLERANCE = 0.25   # Batch periods further off are not learned
+PERIOD_ALPHA = 0.05       # Weight of a new batch period in the learned period
+PREFILTER_SAMPLE = 10     # Tier 2 runs every N-th batch of a flooded ID
+
+def with_prefilter(detector_cls):
+    """Subclass of detector_cls with the per-frame rate check in front of add_frame"""
+    base_add_frame = detector_cls.add_frame
+    base_alarm = detector_cls.alarm
+    base_process_suspension = detector_cls.process_suspension
+
+    class PrefilterDetector(detector_cls):
+        __slots__ = ("learned_period", "tokens", "last_arrival", "rate_alarm", "gap_alarm",
+                     "calm", "skipped", "last_error", "suspending")
+
+        def __init__(self, *args, **params):
+            detector_cls.__init__(self, *args, **params)
+            self.learned_period = None
+            self.tokens = PREFILTER_BURST
+            self.last_arrival = None
+            self.rate_alarm = False
+            self.gap_alarm = False
+            self.calm = 0          # Regular intervals in a row while flooded
+            self.skipped = 0       # Frames kept from tier 2 during the current flood
+            self.last_error = 0.0
+            self.suspending = False
+
+        def add_frame(self, now):
+            if self.suspending:
+                return base_add_frame(self, now)
+            raised = self.check_rate(now)
+
+            if self.rate_alarm:
+                # Tier 2 sampled: skip (PREFILTER_SAMPLE - 1) batches, then one full batch
+                cycle = PREFILTER_SAMPLE * self.batch_size
+                position = self.skipped % cycle
+                self.skipped += 1
+                if position < cycle - self.batch_size:
+                    return self.rate_result() if raised else None
+                if position == cycle - self.batch_size:
+                    self.reset_batch()
+
+            result = base_add_frame(self, now)
+            if result is not None:
+                self.last_error = result[1]
+                self.learn_period()
+            elif raised:
+                result = self.rate_result()
+            return result
+
+        def check_rate(self, now):
+            """Tier 1: token bucket; returns True when the flood alarm is raised"""
+            last = self.last_arrival
+            self.last_arrival = now
+            period = self.learned_period
+            if last is None or period is None:
+                return False
+
+            interval = now - last
+            self.gap_alarm = False  # The ID is back (the alarm is raised by check_gap)
+
+            was_flooded = self.rate_alarm
+            if was_flooded:
+                self.calm = self.calm + 1 if interval >= (1.0 - PERIOD_TOLERANCE) * period else 0
+                if self.calm >= PREFILTER_BURST:
+                    # Back at the learned rate: tier 2 starts a fresh batch
+                    self.rate_alarm = False
+                    self.tokens = PREFILTER_BURST - 1.0
+                    self.skipped = 0
+                    self.reset_batch()
+                return False
+
+            tokens = min(self.tokens + interval / period, PREFILTER_BURST) - 1.0
+            if tokens < 0.0:
+                self.rate_alarm = True
+                self.calm = 0
+                tokens = 0.0
+            self.tokens = tokens
+
+            return self.rate_alarm
+
+        def learn_period(self):
+            period = self.period
+            learned = self.learned_period
+            if learned is None:
+                self.learned_period = period
+            elif not self.rate_alarm and abs(period - learned) <= PERIOD_TOLERANCE * learned:
+                self.learned_period = learned + PERIOD_ALPHA * (period - learned)
+
+        def rate_result(self):
+            # Tier 1 alarms are reported with the last tier 2 values
+            return self.O_acc, self.last_error, self.L_plus, self.L_minus
+
+        def gap_deadline(self):
+            if self.gap_alarm or self.learned_period is None or self.last_arrival is None:
+                return None
+            return self.last_arrival + GAP_PERIODS * self.learned_period
+
+        def check_gap(self, now):
+            deadline = self.gap_deadline()
+            if deadline is None or now < deadline:
+                return None
+            self.gap_alarm = True
+            return self.rate_result()
+
+        def process_suspension(self, now):
+            # Padded arrivals are tier 2 input only, they must not reach the bucket
+            self.suspending = True
+            try:
+                return base_process_suspension(self, now)
+            finally:
+                self.suspending = False
+
+        def alarm(self):
+            if self.rate_alarm:
+                return "Flood"
+            if self.gap_alarm:
+                return "Gap"
+            return base_alarm(self)
+
+    PrefilterDetector.__name__ = f"Prefilter{detector_cls.__name__}"
+    return PrefilterDetector
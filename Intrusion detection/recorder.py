@@ -0,0 +1,121 @@
+
+import json
+import os
+import numpy as np
+
+# Columnar, bounded-memory result logging. Rows are written into preallocated
+# typed arrays (one per column) and every full chunk is appended to one raw
+# binary file per column, so memory stays at chunk_size rows however long the
+# run is. meta.json records columns, dtype and row count; load_columns()
+# memory-maps the files so plotting never loads a whole run into memory.
+# Without a directory the chunks are kept in memory (short runs, sweeps).
+
+CHUNK_SIZE = 65536
+META_FILE = "meta.json"
+
+class ColumnarRecorder:
+    """
+    directory: output directory (one <column>.bin file per column), None = in memory
+    decimate:  keep every n-th row only
+    """
+    def __init__(self, directory, columns, chunk_size=CHUNK_SIZE, dtype="float64", decimate=1):
+        self.directory = directory
+        self.columns = tuple(columns)
+        self.dtype = np.dtype(dtype)
+        self.chunk_size = chunk_size
+        self.decimate = max(1, int(decimate))
+
+        self.buffers = [np.empty(chunk_size, self.dtype) for _ in self.columns]
+        self.n = 0        # Rows in the buffers
+        self.rows = 0     # Rows flushed
+        self.seen = 0     # Rows offered (before decimation)
+
+        if directory is None:
+            self.chunks = [[] for _ in self.columns]
+        else:
+            os.makedirs(directory, exist_ok=True)
+            self.files = [open(os.path.join(directory, f"{c}.bin"), "wb") for c in self.columns]
+            self._write_meta()
+
+    def append(self, *values):
+        """One row, values in column order"""
+        seen = self.seen
+        self.seen = seen + 1
+        if seen % self.decimate:
+            return
+
+        i = self.n
+        for buf, value in zip(self.buffers, values):
+            buf[i] = value
+        self.n = i + 1
+        if self.n == self.chunk_size:
+            self.flush()
+
+    def extend(self, *columns):
+        """Many rows at once, one array per column"""
+        n = len(columns[0])
+        keep = np.arange((-self.seen) % self.decimate, n, self.decimate)
+        self.seen += n
+        if len(keep) == len(columns[0]):
+            keep = slice(None)
+
+        self.flush()
+        self._write([np.asarray(col, self.dtype)[keep] for col in columns])
+
+    def flush(self):
+        if self.n:
+            self._write([buf[:self.n] for buf in self.buffers])
+            self.n = 0
+
+    def _write(self, arrays):
+        self.rows += len(arrays[0])
+        if self.directory is None:
+            for chunks, arr in zip(self.chunks, arrays):
+                chunks.append(arr.copy())
+        else:
+            for f, arr in zip(self.files, arrays):
+                arr.tofile(f)
+                f.flush()
+            self._write_meta()
+
+    def close(self):
+        self.flush()
+        if self.directory is not None:
+            for f in self.files:
+                f.close()
+
+    def result(self):
+        """Closes the recorder and returns {column: array}, memory-mapped when on disk"""
+        self.close()
+        if self.directory is not None:
+            return load_columns(self.directory)
+        return {c: np.concatenate(chunks) if chunks else np.empty(0, self.dtype)
+                for c, chunks in zip(self.columns, self.chunks)}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _write_meta(self):
+        meta = {"columns": list(self.columns), "dtype": self.dtype.str,
+                "rows": self.rows, "decimate": self.decimate}
+        with open(os.path.join(self.directory, META_FILE), "w") as f:
+            json.dump(meta, f)
+
+def load_columns(directory):
+    """Returns {column: read-only memory-mapped array} of a recorded run"""
+    with open(os.path.join(directory, META_FILE)) as f:
+        meta = json.load(f)
+    dtype = np.dtype(meta["dtype"])
+    rows = meta["rows"]
+
+    columns = {}
+    for c in meta["columns"]:
+        path = os.path.join(directory, f"{c}.bin")
+        if rows == 0:
+            columns[c] = np.empty(0, dtype)
+        else:
+            columns[c] = np.memmap(path, dtype=dtype, mode="r", shape=(rows,))
+    return columns
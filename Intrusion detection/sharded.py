@@ -0,0 +1,242 @@
+
+import multiprocessing as mp
+import queue as queue_module
+import time
+from multiprocessing import shared_memory
+import numpy as np
+import can
+from bus_config import get_bus, configure_from_args
+from cids import DeadlineScheduler, make_registry, make_telemetry, handle_frame, handle_deadlines, build_parser
+from ingest import FrameQueue, QUEUE_SIZE, DRAIN_MAX, STATS_INTERVAL
+
+# Sharded detection: one receiver process reads every bus (one FrameQueue per
+# channel) and distributes the frames by arbitration ID, or by channel, to N
+# worker processes. Frames travel through one single-producer/single-consumer
+# ring buffer in shared memory per worker as fixed-size records, written and
+# read in bulk with NumPy, so nothing is pickled per frame. Each worker owns
+# the detector state of its IDs; only alarms go back over a multiprocessing
+# queue and are logged centrally.
+
+RING_SIZE = 1 << 16            # Records per worker ring
+RECORD_DTYPE = np.dtype([("timestamp", "<f8"), ("arb_id", "<u4"), ("channel", "<u4")])
+HEADER_SIZE = 128              # head and tail on separate cache lines
+IDLE_SLEEP = 0.001             # Poll interval of an empty ring / idle buses
+SHARD_MODES = ("id", "channel")
+
+class ShmRing:
+    """
+    SPSC ring of RECORD_DTYPE records in shared memory. The producer only writes
+    head, the consumer only writes tail, so no lock is needed. A full ring drops
+    the new records (counted in dropped) instead of blocking the receiver.
+    name=None creates the ring, otherwise an existing ring is attached.
+    """
+    def __init__(self, capacity=RING_SIZE, name=None):
+        create = name is None
+        size = HEADER_SIZE + capacity * RECORD_DTYPE.itemsize
+        self.shm = shared_memory.SharedMemory(name=name, create=create, size=size)
+        self.owner = create
+        self.capacity = capacity
+        buf = self.shm.buf
+        self.head = np.ndarray((1,), np.int64, buf, 0)
+        self.tail = np.ndarray((1,), np.int64, buf, 64)
+        self.records = np.ndarray((capacity,), RECORD_DTYPE, buf, HEADER_SIZE)
+        if create:
+            self.head[0] = 0
+            self.tail[0] = 0
+        self.dropped = 0
+
+    @property
+    def name(self):
+        return self.shm.name
+
+    def push_many(self, records):
+        """Appends a RECORD_DTYPE array; returns the number of records written"""
+        head = int(self.head[0])
+        free = self.capacity - (head - int(self.tail[0]))
+        n = len(records)
+        if n > free:
+            self.dropped += n - free
+            n = free
+        if n == 0:
+            return 0
+
+        i = head % self.capacity
+        first = min(n, self.capacity - i)
+        self.records[i:i + first] = records[:first]
+        if first < n:
+            self.records[:n - first] = records[first:n]
+        # Publish only after the records are in place
+        self.head[0] = head + n
+        return n
+
+    def pop_many(self, max_records=DRAIN_MAX):
+        """Removes and returns up to max_records records (a copy)"""
+        tail = int(self.tail[0])
+        n = min(int(self.head[0]) - tail, max_records)
+        if n <= 0:
+            return self.records[:0].copy()
+
+        i = tail % self.capacity
+        first = min(n, self.capacity - i)
+        out = self.records[i:i + first].copy()
+        if first < n:
+            out = np.concatenate((out, self.records[:n - first]))
+        self.tail[0] = tail + n
+        return out
+
+    def __len__(self):
+        return int(self.head[0]) - int(self.tail[0])
+
+    def close(self):
+        # Drop the NumPy views first, the buffer can not be closed while they exist
+        del self.head, self.tail, self.records
+        self.shm.close()
+        if self.owner:
+            self.shm.unlink()
+
+class AlarmForwarder:
+    """Stands in for the TelemetryWriter in a worker: only alarms are sent to the receiver"""
+    def __init__(self, alarms, channel):
+        self.alarms = alarms
+        self.channel = channel
+        self.batches = 0
+        self.dropped = 0
+
+    def record(self, arb_id, now, time_sec, result, shift=None, suspended=False):
+        self.batches += 1
+        if shift is not None:
+            self.alarms.put((self.channel, arb_id, now, time_sec, tuple(result), shift, suspended))
+
+def shard_worker(shard, ring_name, ring_size, alarms, stop, allowed_ids, id_params, every, ecu_clusters, pmf,
+                 prefilter):
+    """Worker process: drains its ring and runs the detectors of its IDs, per channel"""
+    ring = ShmRing(ring_size, ring_name)
+    channels = {}  # channel -> (registry, scheduler, forwarder)
+
+    def state(channel):
+        entry = channels.get(channel)
+        if entry is None:
+            print(f"Shard {shard}, channel {channel}: ", end="")
+            registry = make_registry(allowed_ids, id_params, every, ecu_clusters=ecu_clusters, pmf=pmf,
+                                     prefilter=prefilter)
+            entry = (registry, DeadlineScheduler(), AlarmForwarder(alarms, channel))
+            channels[channel] = entry
+        return entry
+
+    try:
+        while not stop.is_set():
+            records = ring.pop_many(DRAIN_MAX)
+            if len(records) == 0:
+                time.sleep(IDLE_SLEEP)
+                now = time.time()
+            else:
+                for timestamp, arb_id, channel in records.tolist():
+                    registry, scheduler, forwarder = state(channel)
+                    handle_frame(registry, scheduler, forwarder, arb_id, timestamp)
+                # With a backlog, deadlines are checked against the last handled frame
+                now = records[-1]["timestamp"] if len(ring) else time.time()
+
+            for registry, scheduler, forwarder in channels.values():
+                handle_deadlines(registry, scheduler, forwarder, now)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        ring.close()
+
+def shard_of(arb_ids, channels, workers, shard_by):
+    if shard_by == "channel":
+        return channels % workers
+    return arb_ids % workers
+
+def run_cids_sharded(workers=None, bus_channels=None, shard_by="id", allowed_ids=None, id_params=None,
+                     every=None, ecu_clusters=False, ring_size=RING_SIZE, queue_size=QUEUE_SIZE,
+                     stats_interval=STATS_INTERVAL, telemetry=None, pmf=False, prefilter=False):
+    """
+    workers:      number of detector processes (default: one per core)
+    bus_channels: bus channels to monitor (default: the configured channel)
+    shard_by:     "id" (arbitration ID modulo workers) or "channel"
+    """
+    if shard_by not in SHARD_MODES:
+        raise ValueError(f"Unknown shard mode: {shard_by}")
+    workers = workers or mp.cpu_count()
+    ctx = mp.get_context("spawn")
+    alarms = ctx.Queue()
+    stop = ctx.Event()
+    telemetry = telemetry or make_telemetry()
+
+    # Workers start before any bus thread exists
+    rings = [ShmRing(ring_size) for _ in range(workers)]
+    processes = [ctx.Process(target=shard_worker, daemon=True,
+                             args=(shard, ring.name, ring_size, alarms, stop, allowed_ids, id_params,
+                                   every, ecu_clusters, pmf, prefilter))
+                 for shard, ring in enumerate(rings)]
+    for process in processes:
+        process.start()
+
+    buses = [get_bus(monitored_ids=allowed_ids, **({"channel": ch} if ch is not None else {}))
+             for ch in (bus_channels or [None])]
+    queues = [FrameQueue(queue_size) for _ in buses]
+    notifiers = [can.Notifier(bus, [q]) for bus, q in zip(buses, queues)]
+    print(f"CIDS Active (sharded by {shard_by}, {workers} workers, {len(buses)} buses)")
+
+    next_stats = time.time() + stats_interval
+    try:
+        while True:
+            idle = True
+            for channel, frame_queue in enumerate(queues):
+                frames = frame_queue.drain(DRAIN_MAX, timeout=0)
+                if not frames:
+                    continue
+                idle = False
+                records = np.empty(len(frames), RECORD_DTYPE)
+                columns = np.array(frames)
+                records["arb_id"] = columns[:, 0]
+                records["timestamp"] = columns[:, 1]
+                records["channel"] = channel
+                shards = shard_of(records["arb_id"], records["channel"], workers, shard_by)
+                for shard, ring in enumerate(rings):
+                    ring.push_many(records[shards == shard])
+
+            while True:
+                try:
+                    channel, arb_id, now, time_sec, result, shift, suspended = alarms.get_nowait()
+                except queue_module.Empty:
+                    break
+                telemetry.record(arb_id, now, time_sec, result, shift, suspended)
+
+            now = time.time()
+            if now >= next_stats:
+                depth = " ".join(f"{len(ring)}" for ring in rings)
+                dropped = sum(ring.dropped for ring in rings) + sum(q.dropped for q in queues)
+                print(f"Ring depth per shard: {depth} | dropped: {dropped}")
+                next_stats = now + stats_interval
+            if idle:
+                time.sleep(IDLE_SLEEP)
+    except KeyboardInterrupt:
+        print("CIDS stopped")
+    finally:
+        for notifier in notifiers:
+            notifier.stop()
+        stop.set()
+        for process in processes:
+            process.join(timeout=5)
+        for ring in rings:
+            ring.close()
+        telemetry.close()
+        for bus in buses:
+            bus.shutdown()
+
+if __name__ == "__main__":
+    parser = build_parser("CIDS live detector sharded over worker processes")
+    parser.add_argument("--workers", type=int, help="detector processes (default: one per core)")
+    parser.add_argument("--shard-by", choices=SHARD_MODES, default="id")
+    parser.add_argument("--channels", nargs="+", help="monitor several bus channels, e.g. can0 can1 can2 can3")
+    parser.add_argument("--ring-size", type=int, default=RING_SIZE)
+    args = parser.parse_args()
+    if args.checkpoint or args.metrics_port:
+        parser.error("--checkpoint and --metrics-port are not supported in sharded mode")
+    configure_from_args(args)
+    run_cids_sharded(args.workers, args.channels, args.shard_by, args.ids, every=args.every,
+                     ecu_clusters=args.ecu_clusters, ring_size=args.ring_size,
+                     telemetry=make_telemetry(args), pmf=args.pmf,
+                     prefilter=args.prefilter)
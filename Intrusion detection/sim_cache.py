@@ -0,0 +1,123 @@
+
+import hashlib
+import inspect
+import json
+import os
+import shutil
+import numpy as np
+
+# Content-addressed cache of simulation results. The key is a SHA-256 over the
+# scenario name, every simulation parameter (seed included) and a code version:
+# the source of the functions and classes the result depends on, so editing a
+# plot function keeps the cache while editing the detector invalidates it.
+# One entry is a directory with one .npy file per per-batch column; loading
+# memory-maps them (np.load ignores mmap_mode for .npz archives), so re-plotting
+# takes milliseconds and only pages in what is drawn. Entries are evicted least
+# recently used first once the cache grows beyond max_bytes.
+
+CACHE_DIR = "sim_cache"
+CACHE_MAX_BYTES = 256 * 1024 * 1024
+INDEX_FILE = "index.json"
+
+def code_version(*objects):
+    """Hash of the source code of modules, classes or functions"""
+    h = hashlib.sha256()
+    for obj in objects:
+        h.update(inspect.getsource(obj).encode())
+    return h.hexdigest()
+
+def run_key(name, params, version):
+    """Cache key of one simulation run (params must be JSON serializable)"""
+    text = json.dumps({"name": name, "params": params, "code": version}, sort_keys=True)
+    return hashlib.sha256(text.encode()).hexdigest()
+
+class ResultCache:
+    def __init__(self, directory=CACHE_DIR, max_bytes=CACHE_MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        os.makedirs(directory, exist_ok=True)
+
+    def path(self, key):
+        return os.path.join(self.directory, key)
+
+    def load(self, key):
+        """{name: read-only memory-mapped array} of a cached run, or None"""
+        path = self.path(key)
+        try:
+            with open(os.path.join(path, INDEX_FILE)) as f:
+                names = json.load(f)
+            arrays = {name: np.load(os.path.join(path, f"{i}.npy"), mmap_mode="r")
+                      for i, name in enumerate(names)}
+            os.utime(path)  # Recently used
+        except (OSError, ValueError):
+            return None
+        return arrays
+
+    def store(self, key, arrays):
+        path = self.path(key)
+        tmp = f"{path}.{os.getpid()}.tmp"
+        os.makedirs(tmp, exist_ok=True)
+        for i, values in enumerate(arrays.values()):
+            np.save(os.path.join(tmp, f"{i}.npy"), values)
+        # The index last: an entry without one is incomplete and never loaded
+        with open(os.path.join(tmp, INDEX_FILE), "w") as f:
+            json.dump(list(arrays), f)
+        shutil.rmtree(path, ignore_errors=True)
+        try:
+            os.replace(tmp, path)
+        except OSError:
+            shutil.rmtree(tmp, ignore_errors=True)  # Another process stored it meanwhile
+        self.evict()
+
+    def evict(self):
+        """Deletes the least recently used entries until the cache fits into max_bytes"""
+        # Several processes may share the cache (cli.py plot), entries can vanish meanwhile
+        entries = []
+        for name in os.listdir(self.directory):
+            path = os.path.join(self.directory, name)
+            if name.endswith(".tmp") or not os.path.isdir(path):
+                continue
+            try:
+                size = sum(entry.stat().st_size for entry in os.scandir(path))
+                mtime = os.stat(path).st_mtime
+            except FileNotFoundError:
+                continue
+            entries.append((mtime, size, path))
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            shutil.rmtree(path, ignore_errors=True)
+            total -= size
+
+    def run(self, name, params, version, compute, pack=None, unpack=None, force=False):
+        """
+        Returns compute() for these params, from the cache if it has the result.
+        pack / unpack convert between the result and {name: array}; the default
+        handles a tuple of {column: array} logs.
+        force: recompute and overwrite the cached result
+        """
+        pack = pack or pack_logs
+        unpack = unpack or unpack_logs
+        key = run_key(name, params, version)
+        if not force:
+            arrays = self.load(key)
+            if arrays is not None:
+                print(f"Loaded {name} from {self.path(key)}")
+                return unpack(arrays)
+
+        result = compute()
+        self.store(key, pack(result))
+        return result
+
+def pack_logs(logs):
+    """(log, log, ...) with {column: array} logs -> {"<i>/<column>": array}"""
+    return {f"{i}/{column}": np.asarray(values)
+            for i, log in enumerate(logs) for column, values in log.items()}
+
+def unpack_logs(arrays):
+    logs = {}
+    for name, values in arrays.items():
+        i, column = name.split("/", 1)
+        logs.setdefault(int(i), {})[column] = values
+    return tuple(logs[i] for i in sorted(logs))
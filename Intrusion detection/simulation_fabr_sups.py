@@ -1,92 +1,64 @@
-import matplotlib.pyplot as plt
-import pandas as pd
+import argparse
+import os
+import numpy as np
 import random
 
-# --- CONFIGURATION ---
-BATCH_SIZE = 20
-LAMBDA = 0.9995
-K_PARAM = 0.5
-THRESHOLD = 5.0
+import detector_core
+from detector_core import BATCH_SIZE, THRESHOLD
+from recorder import ColumnarRecorder
+from sim_cache import ResultCache, code_version
 
+# --- CONFIGURATION ---
 DURATION_TOTAL = 800 
 ATTACK_START_TIME = 400
 
-class CIDS:
-    def __init__(self):
-        self.P = 100.0      
-        self.S = 0.0        
-        self.O_acc = 0.0    
-        self.timestamps = []
-        self.start_time = None
-        
-        # CUSUM
-        self.mu_e = 0.0     
-        self.sigma_e = 0.005 
-        self.L_plus = 0.0   
-        self.L_minus = 0.0  
-        
-        # Previous Batch Interval (Paper Algorithm 1 logic)
-        self.prev_mu_T = None 
-        
-        # Data Logging
-        self.log_data = []
-
-    def rls_update(self, t, error):
-        G = (self.P * t) / (LAMBDA + t * self.P * t)
-        self.P = (self.P - G * t * self.P) / LAMBDA
-        self.S = self.S + (G * error)
-
-    def process_batch(self, batch_times):
-        N = len(batch_times)
-        if N < 2: return
+# Timing model used by the vectorized engine (same values as run_dual_simulation)
+JITTER_RANGE = 0.00005     # 50us jitter
+BASE_INTERVAL = 0.05       # 50ms period
+FABRICATION_INTERVAL = 0.002
+SUSPENSION_STEP = 0.1
+SUSPENSION_TIMEOUT = 0.5
+SUSPENSION_FAKE_INTERVAL = detector_core.SUSPENSION_FAKE_INTERVAL
 
-        if self.start_time is None:
-            self.start_time = self.timestamps[0]
+# Per-batch log (columnar, see recorder.py)
+LOG_COLUMNS = ("Time_Sec", "Accumulated_Offset_ms", "Ident_Error_e", "L_Plus", "L_Minus")
+SEED = 0  # Seed of the plotted runs, so they can be cached
 
-        # 1. Calculate Current Batch Average Interval
-        intervals = [batch_times[i] - batch_times[i-1] for i in range(1, N)]
-        current_mu_T = sum(intervals) / len(intervals)
-        
-        # 2. Calculate Offset
-        reference_mu_T = self.prev_mu_T if self.prev_mu_T else current_mu_T
-        
-        t0 = batch_times[0]
-        offsets = [(batch_times[i] - (t0 + i * reference_mu_T)) for i in range(1, N)]
-        avg_offset = sum(offsets) / len(offsets)
+class CIDS(detector_core.CIDS):
+    """Shared detector core with the previous batch interval as reference (Paper Algorithm 1)"""
+    def __init__(self, recorder=None, **params):
+        params.setdefault("reference", "previous")
+        super().__init__(**params)
         
-        # Update state of mu_T
-        self.prev_mu_T = current_mu_T
-        
-        # 3. Accumulated Offset
-        self.O_acc += abs(avg_offset)
-        
-        # 4. Identification Error
-        t_k = batch_times[-1] - self.start_time
-        error = self.O_acc - (self.S * t_k)
-        
-        # 5. RLS Update
-        self.rls_update(t_k, error)
-        
-        # 6. CUSUM Update
-        normalized = (error - self.mu_e) / self.sigma_e
-        self.L_plus = max(0, self.L_plus + normalized - K_PARAM)
-        self.L_minus = max(0, self.L_minus - normalized - K_PARAM)
+        # Data Logging
+        self.recorder = recorder if recorder is not None else ColumnarRecorder(None, LOG_COLUMNS)
+
+    def process_batch(self, batch_times, reference_mu_T=None):
+        result = super().process_batch(batch_times, reference_mu_T)
+        if result is None: return None
+        O_acc, error = result
         
-        self.log_data.append({
-            "Time_Sec": t_k,
-            "Accumulated_Offset_ms": self.O_acc * 1000,
-            "Ident_Error_e": error * 1000,
-            "L_Plus": self.L_plus,
-            "L_Minus": self.L_minus
-        })
+        self.recorder.append(batch_times[-1] - self.start_time, O_acc * 1000, error * 1000,
+                             self.L_plus, self.L_minus)
+        return result
+
+def _recorders(out_dir, attack_type, decimate):
+    """Recorders for the "w/ attack" and "w/o attack" lines (in memory if out_dir is None)"""
+    recorders = []
+    for line in ("attack", "normal"):
+        directory = os.path.join(out_dir, attack_type, line) if out_dir else None
+        recorders.append(ColumnarRecorder(directory, LOG_COLUMNS, decimate=decimate))
+    return recorders
 
 # --- run fabrication and suspension attack for plot ---
-def run_dual_simulation(attack_type):
+def run_dual_simulation(attack_type, out_dir=None, decimate=1):
+    """Returns ({column: array} w/ attack, {column: array} w/o attack)"""
     print(f"Simulating {attack_type} (With vs Without Attack)...")
+    rec_attack, rec_normal = _recorders(out_dir, attack_type, decimate)
     
     # We run TWO detectors simultaneously
-    ids_attack = CIDS() # Will experience the attack
-    ids_normal = CIDS() # Will stay normal without attack
+    ids_attack = CIDS(rec_attack) # Will experience the attack
+    ids_normal = CIDS(rec_normal) # Will stay normal without attack
     
     # Independent time trackers
     time_attack = 0.0
@@ -111,7 +83,6 @@ def run_dual_simulation(attack_type):
         interval_n = BASE_INTERVAL + common_jitter
         time_normal += interval_n
         
-        if not ids_normal.timestamps: ids_normal.timestamps.append(time_normal)
         batch_buf_normal.append(time_normal)
         
         if len(batch_buf_normal) >= BATCH_SIZE:
@@ -124,7 +95,6 @@ def run_dual_simulation(attack_type):
             interval_a = BASE_INTERVAL + common_jitter
             time_attack += interval_a
             
-            if not ids_attack.timestamps: ids_attack.timestamps.append(time_attack)
             batch_buf_attack.append(time_attack)
             
             if len(batch_buf_attack) >= BATCH_SIZE:
@@ -163,11 +133,134 @@ def run_dual_simulation(attack_type):
                     batch_buf_attack = []
                     last_suspension_check = time_attack
 
-    return pd.DataFrame(ids_attack.log_data), pd.DataFrame(ids_normal.log_data)
+    return rec_attack.result(), rec_normal.result()
+
+# --- vectorized NumPy engine (same timelines and log columns as run_dual_simulation) ---
+
+def _advance(start, step, end):
+    """Times start+step, start+2*step, ... up to and including the first one >= end"""
+    n = int(np.ceil((end - start) / step)) + 2
+    steps = np.full(n + 1, step)
+    steps[0] = start
+    times = np.cumsum(steps)[1:]  # sequential sum, same rounding as "t += step"
+    return times[:np.searchsorted(times, end, side='left') + 1]
+
+def _attack_batches(rng, attack_type, batch_size):
+    # 1. Before the attack: both lines share the jitter of every step
+    n_guess = int(ATTACK_START_TIME / (BASE_INTERVAL - JITTER_RANGE)) + 2
+    jitter_pre = rng.uniform(-JITTER_RANGE, JITTER_RANGE, n_guess)
+    pre = np.cumsum(BASE_INTERVAL + jitter_pre)
+    n_pre = int(np.searchsorted(pre, ATTACK_START_TIME, side='left')) + 1
+    pre, jitter_pre = pre[:n_pre], jitter_pre[:n_pre]
+
+    # 2. After the attack
+    if attack_type == "fabrication":
+        post = _advance(pre[-1], FABRICATION_INTERVAL, DURATION_TOTAL)
+        times = np.concatenate([pre, post])
+        n_full = len(times) // batch_size
+        batches = times[:n_full * batch_size].reshape(n_full, batch_size)
+
+    elif attack_type == "suspension":
+        post = _advance(pre[-1], SUSPENSION_STEP, DURATION_TOTAL)
+        n_full = n_pre // batch_size
+        leftover = pre[n_full * batch_size:]
+        fake_steps = np.full(batch_size + 1, SUSPENSION_FAKE_INTERVAL)
+
+        # Only the timeout checks are sequential, one per 0.1s step
+        fake_rows = []
+        last_suspension_check = pre[-1]
+        for time_attack in post.tolist():
+            if (time_attack - last_suspension_check) > SUSPENSION_TIMEOUT:
+                fake_steps[0] = time_attack
+                missing = batch_size - len(leftover)
+                fake = np.cumsum(fake_steps[:missing + 1])[1:]
+                fake_rows.append(np.concatenate([leftover, fake]))
+                leftover = pre[:0]
+                last_suspension_check = time_attack
+
+        batches = pre[:n_full * batch_size].reshape(n_full, batch_size)
+        if fake_rows:
+            batches = np.vstack([batches, np.array(fake_rows)])
+    else:
+        raise ValueError(f"Unknown attack type: {attack_type}")
+
+    return batches, jitter_pre, len(post)
+
+def _batch_offsets(batches):
+    """Average offset (vs. previous batch interval) of all batches at once"""
+    N = batches.shape[1]
+    t0 = batches[:, 0]
+    current_mu_T = (batches[:, -1] - t0) / (N - 1)
+
+    # Paper Algorithm 1: offset is taken against the previous batch interval
+    reference_mu_T = np.empty_like(current_mu_T)
+    reference_mu_T[:1] = current_mu_T[:1]
+    reference_mu_T[1:] = current_mu_T[:-1]
+
+    # Same arithmetic as detector_core.CIDS.process_batch (sequential sum)
+    acc = np.cumsum(batches - t0[:, None], axis=1)[:, -1]
+    return acc / (N - 1) - reference_mu_T * N / 2
+
+def _log_frame(batches, recorder, **params):
+    if len(batches) == 0:
+        return recorder.result()
+    avg_offset = _batch_offsets(batches)
+    t_k = batches[:, -1] - batches[0, 0]
+
+    # Only the RLS/CUSUM recursion of the shared core runs per batch
+    ids = detector_core.CIDS(**params)
+    n = len(t_k)
+    O_acc, errors, L_plus, L_minus = np.empty(n), np.empty(n), np.empty(n), np.empty(n)
+    for k, (t, offset) in enumerate(zip(t_k.tolist(), avg_offset.tolist())):
+        errors[k] = ids.update(t, offset)
+        O_acc[k], L_plus[k], L_minus[k] = ids.O_acc, ids.L_plus, ids.L_minus
+
+    recorder.extend(t_k, O_acc * 1000, errors * 1000, L_plus, L_minus)
+    return recorder.result()
+
+def run_dual_simulation_vectorized(attack_type, seed=None, batch_size=BATCH_SIZE,
+                                   out_dir=None, decimate=1, **params):
+    """
+    Same scenario as run_dual_simulation, but the timestamps of both lines are
+    generated at once with NumPy and reshaped into (n_batches, batch_size).
+    Returns ({column: array} w/ attack, {column: array} w/o attack) with LOG_COLUMNS,
+    memory-mapped from out_dir if given.
+    params: detector parameters (lam, k_param, sigma_e, ...)
+    """
+    print(f"Simulating {attack_type} (With vs Without Attack, vectorized)...")
+    rng = np.random.default_rng(seed)
+
+    batches_attack, jitter_pre, n_post = _attack_batches(rng, attack_type, batch_size)
+
+    # "WITHOUT ATTACK" line: one normal interval per loop step of the attack line
+    jitter = np.concatenate([jitter_pre, rng.uniform(-JITTER_RANGE, JITTER_RANGE, n_post)])
+    times_normal = np.cumsum(BASE_INTERVAL + jitter)
+    n_full = len(times_normal) // batch_size
+    batches_normal = times_normal[:n_full * batch_size].reshape(n_full, batch_size)
+
+    rec_attack, rec_normal = _recorders(out_dir, attack_type, decimate)
+    df_attack = _log_frame(batches_attack, rec_attack, **params)
+    df_normal = _log_frame(batches_normal, rec_normal, **params)
+    return df_attack, df_normal
+
+def cached_dual_simulation(attack_type, seed=SEED, force=False, cache=None, **params):
+    """run_dual_simulation_vectorized through the result cache (see sim_cache.py)"""
+    cache = cache or ResultCache()
+    key_params = dict(params, attack_type=attack_type, seed=seed, duration=DURATION_TOTAL,
+                      attack_start=ATTACK_START_TIME, jitter=JITTER_RANGE, interval=BASE_INTERVAL,
+                      fabrication_interval=FABRICATION_INTERVAL, suspension_step=SUSPENSION_STEP,
+                      suspension_timeout=SUSPENSION_TIMEOUT, columns=LOG_COLUMNS)
+    # Everything the per-batch log depends on; the plotting code is left out
+    version = code_version(detector_core, _advance, _attack_batches, _batch_offsets, _log_frame,
+                           run_dual_simulation_vectorized)
+    return cache.run(f"fabr_sups/{attack_type}", key_params, version,
+                     lambda: run_dual_simulation_vectorized(attack_type, seed=seed, **params), force=force)
 
 # --- PLOTTING ---
 
 def plot_paper_figure(df_attack, df_normal, title, filename):
+    import matplotlib.pyplot as plt  # Only when plotting (slow import)
+
     # Setup 3 subplots like Figure 6
     fig, (ax1, ax2, ax3) = plt.subplots(3, 1, figsize=(10, 8), sharex=True)
     
@@ -217,10 +310,15 @@ def plot_paper_figure(df_attack, df_normal, title, filename):
     plt.close()
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Figure 6 replication (fabrication and suspension)")
+    parser.add_argument("--seed", type=int, default=SEED)
+    parser.add_argument("--force", action="store_true", help="re-run the simulations even if they are cached")
+    args = parser.parse_args()
+
     # 1. Fabrication Attack (Figure 6a)
-    df_att, df_norm = run_dual_simulation("fabrication")
+    df_att, df_norm = cached_dual_simulation("fabrication", args.seed, args.force)
     plot_paper_figure(df_att, df_norm, "Fabrication Attack", "figure_6a_replication.png")
     
     # 2. Suspension Attack (Figure 6b)
-    df_att, df_norm = run_dual_simulation("suspension")
+    df_att, df_norm = cached_dual_simulation("suspension", args.seed, args.force)
     plot_paper_figure(df_att, df_norm, "Suspension Attack", "figure_6b_replication.png")
\ No newline at end of file
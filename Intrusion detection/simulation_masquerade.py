@@ -1,201 +1,176 @@
-import matplotlib.pyplot as plt
-import pandas as pd
-import numpy as np
+import argparse
+import os
 import random
 
+import detector_core
+from detector_core import THRESHOLD
+from recorder import ColumnarRecorder
+from interval_histogram import IntervalHistogram
+from sim_cache import ResultCache, code_version, pack_logs, unpack_logs
+
 # --- CONFIGURATION ---
-BATCH_SIZE = 20
-LAMBDA = 0.9995
-K_PARAM = 0.5
-THRESHOLD = 5.0
 DURATION_NORMAL = 400
 DURATION_ATTACK = 400 
+BASELINE_MU_T = 0.05  # Interval used once the 200 learning batches are over
 
-class CIDS:
-    def __init__(self):
-        self.P = 100.0      
-        self.S = 0.0        
-        self.O_acc = 0.0    
-        self.timestamps = []
-        self.start_time = None
-        
-        self.mu_e = 0.0     
-        self.sigma_e = 0.001 
-        
-        self.L_plus = 0.0   
-        self.L_minus = 0.0  
-        
-        # Baseline Learning
-        self.baseline_mu_T = 0.0
-        self.batch_count = 0
-        self.learning_phase = True
-        
-        self.log_data = []
-
-    def rls_update(self, t, error):
-        G = (self.P * t) / (LAMBDA + t * self.P * t)
-        self.P = (self.P - G * t * self.P) / LAMBDA
-        self.S = self.S + (G * error)
-
-    def update_statistics(self, error):
-        # Prevent updating stats on huge spikes
-        if self.sigma_e > 0:
-            z_score = abs((error - self.mu_e) / self.sigma_e)
-            if z_score >= 3.0:
-                return
-
-        alpha = 0.01 
-        self.mu_e = (1 - alpha) * self.mu_e + alpha * error
-        var_e = self.sigma_e ** 2
-        var_e = (1 - alpha) * var_e + alpha * ((error - self.mu_e) ** 2)
-        self.sigma_e = max(var_e ** 0.5, 1e-6)
+BASE_INTERVAL = 0.05
+JITTER = 0.00005
 
-    def process_batch(self, batch_times, ghost_times=None):
-        N = len(batch_times)
-        if N < 2: return
+# Reverted to the Skew values that produced the "Plausible" plot
+SKEW_NORMAL = 0.00020
+SKEW_ATTACK = 0.00001
 
-        if self.start_time is None:
-            self.start_time = self.timestamps[0]
+# Per-batch log (columnar, see recorder.py)
+LOG_COLUMNS = ("Time_Sec", "Accumulated_Offset_ms", "Ghost_Offset_Total", "Ghost_Viz", "L_Plus", "L_Minus")
+PMF_RANGE_MS = (48.5, 51.5)   # Interval histogram bins of Figure 8
+PMF_BINS = 59
+SEED = 0  # Seed of the plotted run, so it can be cached
 
-        # 1. Average Interval & Baseline Learning
-        intervals = [batch_times[i] - batch_times[i-1] for i in range(1, N)]
-        current_mu_T = sum(intervals) / len(intervals)
-        
-        if self.learning_phase:
-            self.baseline_mu_T = ((self.baseline_mu_T * self.batch_count) + current_mu_T) / (self.batch_count + 1)
-            self.batch_count += 1
-            if self.batch_count > 200:
-                self.learning_phase = False
-                self.baseline_mu_T = 0.05 
-
-        reference_mu_T = self.baseline_mu_T if not self.learning_phase else current_mu_T
-        
-        # 2. Calculate Real Offset
-        t0 = batch_times[0]
-        offsets = [(batch_times[i] - (t0 + i * reference_mu_T)) for i in range(1, N)]
-        avg_offset = sum(offsets) / len(offsets)
-        self.O_acc += abs(avg_offset)
-        
-        # 3. Calculate "Ghost" Offset
-        ghost_O_acc_val = 0.0
-        if ghost_times:
-             g_t0 = ghost_times[0]
-             g_offsets = [(ghost_times[i] - (g_t0 + i * reference_mu_T)) for i in range(1, len(ghost_times))]
-             g_avg_offset = sum(g_offsets) / len(g_offsets)
-             ghost_O_acc_val = abs(g_avg_offset)
-        
-        # 4. RLS & CUSUM Logic
-        t_k = batch_times[-1] - self.start_time
-        error = self.O_acc - (self.S * t_k)
+class CIDS(detector_core.CIDS):
+    """Shared detector core with a learned baseline interval and adaptive error statistics"""
+    def __init__(self, sigma_e=0.001, recorder=None, **params):
+        params.setdefault("reference", "baseline")
+        params.setdefault("adaptive_sigma", True)
+        params.setdefault("baseline_override", BASELINE_MU_T)
+        super().__init__(sigma_e=sigma_e, **params)
         
-        self.update_statistics(error)
+        self.recorder = recorder if recorder is not None else ColumnarRecorder(None, LOG_COLUMNS)
+        self.ghost_accumulated_total = 0.0
 
-        normalized = (error - self.mu_e) / self.sigma_e
-        
+    def process_batch(self, batch_times, ghost_times=None):
+        # Offset, RLS & CUSUM of the shared core
         # CUSUM: Using L_minus for detection as slope decreases
-        self.L_plus = max(0, self.L_plus + normalized - K_PARAM)
-        self.L_minus = max(0, self.L_minus - normalized - K_PARAM)
-        
-        self.rls_update(t_k, error)
+        result = super().process_batch(batch_times)
+        if result is None: return None
         
-        self.log_data.append({
-            "Time_Sec": t_k,
-            "Accumulated_Offset_ms": self.O_acc * 1000,
-            "Ghost_Offset_Total": ghost_O_acc_val * 1000, 
-            "L_Plus": self.L_plus,
-            "L_Minus": self.L_minus
-        })
-
-def run_masquerade_simulation():
-    ids = CIDS()
+        # Calculate "Ghost" Offset against the same reference interval
+        ghost_O_acc_val = 0.0
+        if ghost_times:
+            g_t0 = ghost_times[0]
+            acc = 0.0
+            for t in ghost_times:
+                acc += t - g_t0
+            g_avg_offset = acc / (len(ghost_times) - 1) - self.reference_mu_T * len(ghost_times) / 2
+            ghost_O_acc_val = abs(g_avg_offset)
+        
+        self.ghost_accumulated_total += ghost_O_acc_val * 1000
+        self.recorder.append(batch_times[-1] - self.start_time, self.O_acc * 1000,
+                             ghost_O_acc_val * 1000, self.ghost_accumulated_total,
+                             self.L_plus, self.L_minus)
+        return result
+
+def _recorder(out_dir, name, columns, decimate=1):
+    directory = os.path.join(out_dir, "masquerade", name) if out_dir else None
+    return ColumnarRecorder(directory, columns, decimate=decimate)
+
+def masquerade_arrivals(rng):
+    """
+    Yields (arrival time, ghost time, attacked) of the Figure 8 scenario: the
+    victim's clock for DURATION_NORMAL seconds, then the attacker's. The ghost
+    line keeps the victim's clock with the same jitter.
+    """
     current_time = 0.0
     ghost_time = 0.0
-    
-    batch_buffer = []
-    ghost_buffer = []
-    
-    # Separate lists for the Histogram (Visuals only)
-    intervals_normal = []
-    intervals_attack = []
-    
-    ghost_accumulated_total = 0.0
-    last_msg_time = 0.0
-    
-    BASE_INTERVAL = 0.05
-    JITTER = 0.00005      
 
-    # Reverted to the Skew values that produced the "Plausible" plot
-    SKEW_NORMAL = 0.00020  
-    SKEW_ATTACK = 0.00001  
-    
     # 1. NORMAL PHASE
     while current_time < DURATION_NORMAL:
-        jitter = random.uniform(-JITTER, JITTER)
+        jitter = rng.uniform(-JITTER, JITTER)
         interval = BASE_INTERVAL * (1 + SKEW_NORMAL) + jitter
         
         current_time += interval
         ghost_time += interval 
-        
-        if last_msg_time > 0: 
-            intervals_normal.append((current_time - last_msg_time)*1000)
-        last_msg_time = current_time
-        
-        if not ids.timestamps: ids.timestamps.append(current_time)
-        batch_buffer.append(current_time)
-        ghost_buffer.append(ghost_time)
-        
-        if len(batch_buffer) >= BATCH_SIZE:
-            ids.process_batch(batch_buffer, ghost_buffer)
-            ghost_accumulated_total += ids.log_data[-1]["Ghost_Offset_Total"]
-            ids.log_data[-1]["Ghost_Viz"] = ghost_accumulated_total
-            batch_buffer = []
-            ghost_buffer = []
+        yield current_time, ghost_time, False
 
     # 2. ATTACK PHASE
     end_time = DURATION_NORMAL + DURATION_ATTACK
     
     while current_time < end_time:
-        jitter = random.uniform(-JITTER, JITTER)
+        jitter = rng.uniform(-JITTER, JITTER)
         
         interval_real = BASE_INTERVAL * (1 + SKEW_ATTACK) + jitter
         current_time += interval_real
         
         interval_ghost = BASE_INTERVAL * (1 + SKEW_NORMAL) + jitter
         ghost_time += interval_ghost
-
+        yield current_time, ghost_time, True
+
+def run_masquerade_simulation(seed=None, out_dir=None, decimate=1, **params):
+    """
+    Returns ({column: array}, IntervalHistogram before, IntervalHistogram after
+    the attack [ms]); the log is memory-mapped from out_dir if given.
+    decimate thins the per-batch log only.
+    """
+    ids = CIDS(recorder=_recorder(out_dir, "log", LOG_COLUMNS, decimate), **params)
+    rng = random.Random(seed)
+    
+    batch_buffer = []
+    ghost_buffer = []
+    
+    # Streaming histograms for the PMF (a few hundred bytes, however long the run)
+    intervals_normal = IntervalHistogram(*PMF_RANGE_MS, PMF_BINS)
+    intervals_attack = IntervalHistogram(*PMF_RANGE_MS, PMF_BINS)
+    
+    last_msg_time = 0.0
+    
+    for current_time, ghost_time, attacked in masquerade_arrivals(rng):
         if last_msg_time > 0: 
-            intervals_attack.append((current_time - last_msg_time)*1000)
+            intervals = intervals_attack if attacked else intervals_normal
+            intervals.add((current_time - last_msg_time)*1000)
         last_msg_time = current_time
-
+        
         batch_buffer.append(current_time)
         ghost_buffer.append(ghost_time)
         
-        if len(batch_buffer) >= BATCH_SIZE:
+        if len(batch_buffer) >= ids.batch_size:
             ids.process_batch(batch_buffer, ghost_buffer)
-            ghost_accumulated_total += ids.log_data[-1]["Ghost_Offset_Total"]
-            ids.log_data[-1]["Ghost_Viz"] = ghost_accumulated_total
             batch_buffer = []
             ghost_buffer = []
            
-    return pd.DataFrame(ids.log_data), intervals_normal, intervals_attack
+    return ids.recorder.result(), intervals_normal, intervals_attack
+
+def _pack(result):
+    log, hist_normal, hist_attack = result
+    arrays = pack_logs((log,))
+    arrays["intervals_normal"] = hist_normal.counts
+    arrays["intervals_attack"] = hist_attack.counts
+    return arrays
+
+def _unpack(arrays):
+    hists = []
+    for name in ("intervals_normal", "intervals_attack"):
+        hist = IntervalHistogram(*PMF_RANGE_MS, PMF_BINS)
+        hist.counts = arrays.pop(name)
+        hist.total = int(hist.counts.sum())
+        hists.append(hist)
+    return (*unpack_logs(arrays), *hists)
+
+def cached_masquerade_simulation(seed=SEED, force=False, cache=None, **params):
+    """run_masquerade_simulation through the result cache (see sim_cache.py)"""
+    cache = cache or ResultCache()
+    key_params = dict(params, seed=seed, duration_normal=DURATION_NORMAL, duration_attack=DURATION_ATTACK,
+                      baseline=BASELINE_MU_T, pmf_range=PMF_RANGE_MS, pmf_bins=PMF_BINS, columns=LOG_COLUMNS)
+    version = code_version(detector_core, CIDS, IntervalHistogram, masquerade_arrivals, run_masquerade_simulation)
+    return cache.run("masquerade", key_params, version, lambda: run_masquerade_simulation(seed, **params),
+                     _pack, _unpack, force)
+
+def plot_figure_8_final(df, intervals_normal, intervals_attack, filename="figure_8_replication.png"):
+    import matplotlib.pyplot as plt  # Only when plotting (slow import)
 
-def plot_figure_8_final(df, intervals_normal, intervals_attack):
     fig, (ax1, ax2, ax3) = plt.subplots(1, 3, figsize=(18, 5))
     
-    # 1. PMF (Probability Mass Function)
-    bins = np.linspace(48.5, 51.5, 60)
-    
+    # 1. PMF (Probability Mass Function), drawn from the streaming histograms
     # "Before" - Dashed Black Outline
-    ax1.hist(intervals_normal, bins=bins, density=True, 
-             histtype='step', color='black', linestyle='--', linewidth=1.5, 
-             label='w/o attack (before)')
+    ax1.stairs(intervals_normal.density(), intervals_normal.edges,
+               color='black', linestyle='--', linewidth=1.5,
+               label='w/o attack (before)')
     
     # "After" - Red Filled (includes the manually added 51.04 blip)
-    ax1.hist(intervals_attack, bins=bins, density=True, 
-             color='red', alpha=0.6, edgecolor='red', 
-             label='w/ attack (after)')
+    ax1.stairs(intervals_attack.density(), intervals_attack.edges, fill=True,
+               color='red', alpha=0.6, edgecolor='red',
+               label='w/ attack (after)')
     
-    ax1.set_title("Probability Mass Function (PMF)", fontweight='bold')
+    distance = intervals_normal.distance(intervals_attack)
+    ax1.set_title(f"Probability Mass Function (PMF), TV distance {distance:.2f}", fontweight='bold')
     ax1.set_xlabel("Message Interval [ms]")
     ax1.set_ylabel("Probability")
     ax1.legend(loc='upper left')
@@ -224,8 +199,15 @@ def plot_figure_8_final(df, intervals_normal, intervals_attack):
     ax3.grid(True)
 
     plt.tight_layout()
-    plt.show()
+    plt.savefig(filename)
+    print(f"✅ Saved {filename}")
+    plt.close()
 
 if __name__ == "__main__":
-    df, int_norm, int_attack = run_masquerade_simulation()
+    parser = argparse.ArgumentParser(description="Figure 8 replication (masquerade)")
+    parser.add_argument("--seed", type=int, default=SEED)
+    parser.add_argument("--force", action="store_true", help="re-run the simulation even if it is cached")
+    args = parser.parse_args()
+
+    df, int_norm, int_attack = cached_masquerade_simulation(args.seed, args.force)
     plot_figure_8_final(df, int_norm, int_attack)
\ No newline at end of file
@@ -0,0 +1,177 @@
+
+import argparse
+import itertools
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from detector_core import BATCH_SIZE, LAMBDA, K_PARAM, THRESHOLD
+import simulation_fabr_sups as fabr_sups
+import simulation_masquerade as masquerade
+
+# Parameter sweep / ROC harness: every (attack type, parameter set, run) is one
+# task and the tasks are spread across a process pool. The threshold does not
+# change the simulation, so each task runs once per parameter set without it and
+# every threshold is applied afterwards to the stored CUSUM trace. All parameter
+# sets share the same list of seeds (common random numbers, derived from the base
+# seed and the run number), so differences between grid points come from the
+# parameters and not from fresh random draws, and the ROC and delay curves over
+# the threshold are monotone.
+
+ATTACK_TYPES = ("fabrication", "suspension", "masquerade")
+
+# Control limit each scenario detects on (as plotted in Figure 6 and Figure 8)
+DETECTION_LIMIT = {
+    "fabrication": "L_Plus",
+    "suspension": "L_Plus",
+    "masquerade": "L_Minus",
+}
+
+DEFAULT_GRID = {
+    "batch_size": [BATCH_SIZE],
+    "lam": [LAMBDA],
+    "k_param": [K_PARAM],
+    "threshold": [THRESHOLD],
+    "sigma_e": [None],  # None = each scenario's own default (0.005 / 0.001)
+}
+
+def task_seed(base_seed, run):
+    """Seed that only depends on the base seed and the run number"""
+    return int(np.random.SeedSequence([base_seed, run]).generate_state(1)[0])
+
+def evaluate_run(df_attack, df_normal, attack_start, duration, threshold, limit="L_Plus"):
+    """
+    Detection and false alarms of one run ({column: array} logs of the simulations).
+    Batches before attack_start (and the "w/o attack" line up to duration, if given)
+    count as normal traffic, batches after it as attacked traffic.
+    """
+    t_attack = np.asarray(df_attack["Time_Sec"])
+    alarms_attack = np.asarray(df_attack[limit]) > threshold
+
+    before = t_attack < attack_start
+    normal_alarms = [alarms_attack[before]]
+    if df_normal is not None:
+        in_window = np.asarray(df_normal["Time_Sec"]) < duration
+        normal_alarms.append((np.asarray(df_normal[limit]) > threshold)[in_window])
+    normal_alarms = np.concatenate(normal_alarms)
+
+    after = ~before
+    hits = np.flatnonzero(alarms_attack & after)
+    detected = len(hits) > 0
+    first_attacked = int(np.argmax(after)) if after.any() else len(after)
+
+    # Suspension batches carry padded timestamps, so the delay is also given in batches
+    return {
+        "detected": detected,
+        "detection_delay": t_attack[hits[0]] - attack_start if detected else np.nan,
+        "detection_delay_batches": hits[0] - first_attacked if detected else np.nan,
+        "false_alarms": int(normal_alarms.sum()),
+        "normal_batches": len(normal_alarms),
+    }
+
+def run_task(task):
+    """
+    One simulation of the grid, evaluated for every threshold; returns one row
+    per threshold. Top-level so the process pool can pickle it.
+    """
+    attack_type, params, thresholds, seed = task
+    sim_params = {k: v for k, v in params.items() if v is not None}
+
+    if attack_type == "masquerade":
+        df_attack, _, _ = masquerade.run_masquerade_simulation(seed=seed, **sim_params)
+        df_normal = None
+        attack_start = masquerade.DURATION_NORMAL
+        duration = masquerade.DURATION_NORMAL + masquerade.DURATION_ATTACK
+    else:
+        df_attack, df_normal = fabr_sups.run_dual_simulation_vectorized(attack_type, seed=seed, **sim_params)
+        attack_start = fabr_sups.ATTACK_START_TIME
+        duration = fabr_sups.DURATION_TOTAL
+
+    rows = []
+    for threshold in thresholds:
+        row = {"attack": attack_type, **params, "threshold": threshold, "seed": seed}
+        row.update(evaluate_run(df_attack, df_normal, attack_start, duration,
+                                threshold, DETECTION_LIMIT[attack_type]))
+        rows.append(row)
+    return rows
+
+def build_tasks(grid, attack_types, runs, base_seed):
+    """One task per attack type, parameter set (without the threshold) and seed"""
+    keys = [k for k in grid if k != "threshold"]
+    thresholds = list(grid["threshold"])
+    seeds = [task_seed(base_seed, run) for run in range(runs)]
+    tasks = []
+    for attack_type in attack_types:
+        for values in itertools.product(*(grid[k] for k in keys)):
+            params = dict(zip(keys, values))
+            for seed in seeds:
+                tasks.append((attack_type, params, thresholds, seed))
+    return tasks
+
+def summarize(runs_df):
+    """One row per attack type and parameter set"""
+    group_cols = [c for c in runs_df.columns
+                  if c not in ("seed", "detected", "detection_delay", "detection_delay_batches",
+                               "false_alarms", "normal_batches")]
+    grouped = runs_df.fillna({"sigma_e": -1}).groupby(group_cols, sort=False)
+    table = grouped.agg(
+        runs=("detected", "size"),
+        detection_rate=("detected", "mean"),
+        false_alarms=("false_alarms", "sum"),
+        normal_batches=("normal_batches", "sum"),
+        mean_delay_sec=("detection_delay", "mean"),
+        median_delay_sec=("detection_delay", "median"),
+        median_delay_batches=("detection_delay_batches", "median"),
+    ).reset_index()
+    table["false_alarm_rate"] = table["false_alarms"] / table["normal_batches"]
+    table["sigma_e"] = table["sigma_e"].replace(-1, np.nan)
+    return table
+
+def run_sweep(grid=None, attack_types=ATTACK_TYPES, runs=10, base_seed=0, workers=None):
+    grid = {**DEFAULT_GRID, **(grid or {})}
+    tasks = build_tasks(grid, attack_types, runs, base_seed)
+    workers = workers or os.cpu_count()
+    print(f"Running {len(tasks)} simulations ({len(grid['threshold'])} thresholds each) on {workers} processes...")
+
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        results = pool.map(run_task, tasks, chunksize=max(1, len(tasks) // (4 * workers)))
+        rows = [row for task_rows in results for row in task_rows]
+    print(f"✅ Sweep finished in {time.perf_counter() - start:.1f}s")
+
+    runs_df = pd.DataFrame(rows)
+    return summarize(runs_df), runs_df
+
+def main():
+    parser = argparse.ArgumentParser(description="Parallel parameter sweep over the CIDS simulations")
+    parser.add_argument("--attacks", nargs="+", choices=ATTACK_TYPES, default=list(ATTACK_TYPES))
+    parser.add_argument("--batch-size", nargs="+", type=int, default=DEFAULT_GRID["batch_size"])
+    parser.add_argument("--lam", nargs="+", type=float, default=DEFAULT_GRID["lam"])
+    parser.add_argument("--k", nargs="+", type=float, default=DEFAULT_GRID["k_param"])
+    parser.add_argument("--threshold", nargs="+", type=float, default=DEFAULT_GRID["threshold"])
+    parser.add_argument("--sigma-e", nargs="+", type=float, default=DEFAULT_GRID["sigma_e"])
+    parser.add_argument("--runs", type=int, default=10, help="randomized runs per grid point")
+    parser.add_argument("--seed", type=int, default=0, help="base seed, the per-run seeds shared by all grid points are derived from it")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("-o", "--output", default="sweep_results.csv")
+    args = parser.parse_args()
+
+    grid = {
+        "batch_size": args.batch_size,
+        "lam": args.lam,
+        "k_param": args.k,
+        "threshold": args.threshold,
+        "sigma_e": args.sigma_e,
+    }
+    table, runs_df = run_sweep(grid, args.attacks, args.runs, args.seed, args.workers)
+
+    table.to_csv(args.output, index=False)
+    runs_df.to_csv(os.path.splitext(args.output)[0] + "_runs.csv", index=False)
+    print(table.to_string(index=False))
+    print(f"✅ Saved {args.output}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,159 @@
+
+import csv
+import struct
+import threading
+from collections import deque
+
+# Buffered alarm and telemetry output for the live detector. The detection
+# thread only appends a tuple to a bounded buffer; a background thread formats
+# and writes the records in batches (CSV, or binary for a .bin path) and does
+# the console output. When the writer falls behind, new records are dropped and
+# counted instead of blocking detection. Alarms have their own buffer so a
+# burst of telemetry can not push them out.
+
+LOG_COLUMNS = ["Arbitration_ID", "Timestamp", "Time_Sec", "Accumulated_Offset_ms",
+               "Ident_Error_e", "L_Plus", "L_Minus", "Alarm", "Suspended"]
+
+BUFFER_SIZE = 16384       # Per-batch records waiting for the writer
+ALARM_BUFFER_SIZE = 4096  # Alarms waiting for the writer
+FLUSH_INTERVAL = 0.5      # Seconds between writes (alarms wake the writer at once)
+
+# Verbosity of the console output (the files are written at every level)
+QUIET, ALARMS, BATCHES = 0, 1, 2
+
+# Binary log: header, then one fixed-size record per batch
+MAGIC = b"CIDL"
+VERSION = 1
+HEADER = struct.Struct("<4sH")
+RECORD = struct.Struct("<I6dBB")   # arb_id, timestamp, time_sec, O_acc, error, L+, L-, alarm, suspended
+SHIFTS = (None, "Positive Shift", "Negative Shift", "Masquerade", "PMF Shift", "Flood", "Gap")
+
+class LogFile:
+    """Append-only batch log, CSV or binary depending on the file extension"""
+    def __init__(self, path):
+        self.binary = path.endswith(".bin")
+        if self.binary:
+            self.f = open(path, "wb")
+            self.f.write(HEADER.pack(MAGIC, VERSION))
+        else:
+            self.f = open(path, "w", newline="")
+            self.writer = csv.writer(self.f)
+            self.writer.writerow(LOG_COLUMNS)
+
+    def write(self, records):
+        if self.binary:
+            pack = RECORD.pack
+            self.f.write(b"".join(pack(arb_id, t, t_sec, O_acc, error, L_plus, L_minus,
+                                       SHIFTS.index(shift), suspended)
+                                  for arb_id, t, t_sec, O_acc, error, L_plus, L_minus, shift, suspended
+                                  in records))
+        else:
+            self.writer.writerows([
+                f"0x{arb_id:X}", f"{t:.6f}", f"{t_sec:.4f}", f"{O_acc * 1000:.4f}",
+                f"{error * 1000:.4f}", f"{L_plus:.4f}", f"{L_minus:.4f}", shift or "", int(suspended)
+            ] for arb_id, t, t_sec, O_acc, error, L_plus, L_minus, shift, suspended in records)
+        self.f.flush()
+
+    def close(self):
+        self.f.close()
+
+def read_binary_log(path):
+    """Yields the records of a binary log as tuples in LOG_COLUMNS order"""
+    with open(path, "rb") as f:
+        magic, version = HEADER.unpack(f.read(HEADER.size))
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"{path} is not a CIDS log (version {VERSION})")
+        for record in RECORD.iter_unpack(f.read()):
+            *values, alarm, suspended = record
+            yield (*values, SHIFTS[alarm], bool(suspended))
+
+class TelemetryWriter:
+    """
+    log_path:   every `sample`-th batch record plus every alarm batch (None = no batch log)
+    alarm_path: alarm batches only (None = no alarm log)
+    verbosity:  QUIET, ALARMS (print alarms) or BATCHES (also print the sampled batches)
+    """
+    def __init__(self, log_path=None, alarm_path=None, sample=1, verbosity=ALARMS,
+                 buffer_size=BUFFER_SIZE, alarm_buffer_size=ALARM_BUFFER_SIZE,
+                 flush_interval=FLUSH_INTERVAL):
+        self.sample = max(1, int(sample))
+        self.verbosity = verbosity
+        self.buffer_size = buffer_size
+        self.alarm_buffer_size = alarm_buffer_size
+        self.flush_interval = flush_interval
+
+        self.log = LogFile(log_path) if log_path else None
+        self.alarm_log = LogFile(alarm_path) if alarm_path else None
+        self.records = deque()
+        self.alarms = deque()
+        self.seen = 0
+        self.dropped = 0
+        self.dropped_alarms = 0
+
+        self.wake = threading.Event()
+        self.stopping = False
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def record(self, arb_id, now, time_sec, result, shift=None, suspended=False):
+        """Hot path: queues one batch result, never waits on the writer"""
+        O_acc, error, L_plus, L_minus = result
+        entry = (arb_id, now, time_sec, O_acc, error, L_plus, L_minus, shift, suspended)
+
+        if shift is not None:
+            if len(self.alarms) < self.alarm_buffer_size:
+                self.alarms.append(entry)
+            else:
+                self.dropped_alarms += 1
+            self.wake.set()
+
+        self.seen += 1
+        if shift is None and self.seen % self.sample:
+            return
+        if len(self.records) < self.buffer_size:
+            self.records.append(entry)
+        else:
+            self.dropped += 1
+
+    def _run(self):
+        while not self.stopping:
+            self.wake.wait(self.flush_interval)
+            self.wake.clear()
+            self._flush()
+
+    def _flush(self):
+        records = _take(self.records)
+        alarms = _take(self.alarms)
+
+        if records:
+            if self.log:
+                self.log.write(records)
+            if self.verbosity >= BATCHES:
+                for arb_id, _, _, O_acc, error, L_plus, L_minus, _, suspended in records:
+                    status = f"L+: {L_plus:.2f} | L-: {L_minus:.2f}"
+                    tag = " | SILENT" if suspended else ""
+                    print(f"[0x{arb_id:X}] O_acc: {O_acc:.4f} | Error: {error:.4f} | {status}{tag}")
+        if alarms:
+            if self.alarm_log:
+                self.alarm_log.write(alarms)
+            if self.verbosity >= ALARMS:
+                for arb_id, _, _, _, _, L_plus, L_minus, shift, _ in alarms:
+                    print(f"INTRUSION DETECTED on 0x{arb_id:X} ({shift} ) | "
+                          f"L+: {L_plus:.2f} | L-: {L_minus:.2f}")
+
+    def close(self):
+        """Stops the writer thread and writes everything still buffered"""
+        self.stopping = True
+        self.wake.set()
+        self.thread.join()
+        self._flush()
+        for log in (self.log, self.alarm_log):
+            if log:
+                log.close()
+        if self.dropped or self.dropped_alarms:
+            print(f"Telemetry dropped {self.dropped} batch records and {self.dropped_alarms} alarms")
+
+def _take(buffer):
+    """Pops everything currently in the buffer (the producer may keep appending)"""
+    popleft = buffer.popleft
+    return [popleft() for _ in range(len(buffer))]
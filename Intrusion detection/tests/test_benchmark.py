@@ -0,0 +1,14 @@
+import benchmark
+import sweep
+
+def test_bench_detection_smoke():
+    results = benchmark.bench_detection(runs=1)
+    assert set(results) == set(sweep.ATTACK_TYPES)
+    for entry in results.values():
+        assert set(entry) == {"runs", "detection_rate", "median_delay_sec", "median_delay_batches"}
+        assert entry["runs"] == 1
+
+def test_bench_throughput_smoke():
+    results = benchmark.bench_throughput(id_counts=(1,), frames_per_id=200)
+    assert set(results["1"]) == {"frames", "registry", "bank"}
+    assert results["1"]["registry"]["frames_per_sec"] > 0
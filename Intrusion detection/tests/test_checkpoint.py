@@ -0,0 +1,83 @@
+import numpy as np
+import pytest
+from checkpoint import Checkpointer, pack_state, restore, save, unpack_state, DOUBLE_FIELDS
+from cids import make_registry
+from detector_bank import DetectorBank, LEARNED_FIELDS
+from detector_core import BATCH_SIZE
+
+def arrivals(n, seed, period=0.05, skew=2e-4, jitter=5e-5, start=0.0):
+    rng = np.random.default_rng(seed)
+    return (start + np.cumsum(period * (1 + skew) + rng.uniform(-jitter, jitter, n))).tolist()
+
+def traffic(n_batches):
+    """Two IDs; n_batches full batches each, so no batch is open at the end"""
+    return {0x11: arrivals(n_batches * BATCH_SIZE, 1), 0x120: arrivals(n_batches * BATCH_SIZE, 2, period=0.1)}
+
+def feed(get, frames, until=None):
+    for arb_id, times in frames.items():
+        for t in times[:until]:
+            get(arb_id).add_frame(t)
+
+@pytest.mark.parametrize("options", [{}, {"prefilter": True}])
+def test_restored_detector_continues_like_the_running_one(tmp_path, options):
+    path = str(tmp_path / "state.bin")
+    frames = traffic(60)
+    split = 30 * BATCH_SIZE
+
+    running = make_registry(**options)
+    feed(running.get, frames, split)
+    save(path, running.detectors)
+
+    restored = make_registry(checkpoint_path=path, **options)
+    for arb_id in frames:
+        for name in DOUBLE_FIELDS:
+            assert getattr(restored.get(arb_id), name, None) == getattr(running.get(arb_id), name, None)
+
+    # Both see the rest of the traffic and end in the same state
+    rest = {arb_id: times[split:] for arb_id, times in frames.items()}
+    feed(running.get, rest)
+    feed(restored.get, rest)
+    for arb_id in frames:
+        for name in DOUBLE_FIELDS:
+            assert getattr(restored.get(arb_id), name, None) == getattr(running.get(arb_id), name, None), name
+    if options.get("prefilter"):
+        assert restored.get(0x11).learned_period == running.get(0x11).learned_period
+
+def test_bank_round_trip(tmp_path):
+    path = str(tmp_path / "bank.bin")
+    frames = traffic(60)
+    split = 30 * BATCH_SIZE
+
+    running = DetectorBank()
+    for arb_id, times in frames.items():
+        for t in times[:split]:
+            running.add_frame(arb_id, t)
+    running.tick()
+    checkpointer = Checkpointer(running, path)
+    checkpointer.close()
+
+    restored = DetectorBank()
+    assert restore(restored, path) == 2
+    for arb_id in frames:
+        for name in LEARNED_FIELDS:
+            assert restored.state(arb_id)[name] == running.state(arb_id)[name]
+
+    for bank in (running, restored):
+        for arb_id, times in frames.items():
+            for t in times[split:]:
+                bank.add_frame(arb_id, t)
+        bank.tick()
+    for arb_id in frames:
+        assert restored.state(arb_id) == running.state(arb_id)
+
+def test_pack_unpack_keeps_none():
+    registry = make_registry()
+    registry.get(0x11).add_frame(1.0)
+    states = unpack_state(pack_state(registry.detectors))
+    assert states[0x11]["start_time"] == 1.0
+    assert states[0x11]["period"] is None
+
+@pytest.mark.parametrize("options", [{"pmf": True}, {"ecu_clusters": True}])
+def test_state_outside_the_checkpoint_is_refused(tmp_path, options):
+    with pytest.raises(ValueError):
+        make_registry(checkpoint_path=str(tmp_path / "state.bin"), **options)
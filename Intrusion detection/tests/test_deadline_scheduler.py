@@ -0,0 +1,39 @@
+from cids import DeadlineScheduler
+
+def test_deadlines_fire_in_order():
+    scheduler = DeadlineScheduler()
+    for arb_id, deadline in [(0x30, 3.0), (0x10, 1.0), (0x40, 4.0), (0x20, 2.0)]:
+        scheduler.arm(arb_id, deadline)
+    assert scheduler.next_deadline() == 1.0
+    assert scheduler.expired(2.5) == [0x10, 0x20]
+    assert scheduler.expired(10.0) == [0x30, 0x40]
+    assert len(scheduler) == 0 and scheduler.next_deadline() is None
+
+def test_later_deadline_replaces_the_old_one():
+    scheduler = DeadlineScheduler()
+    scheduler.arm(0x11, 1.0)
+    scheduler.arm(0x11, 1.5)   # Frames arrived: the heap entry stays at 1.0
+    scheduler.arm(0x11, 2.0)
+    assert len(scheduler.heap) == 1
+    assert scheduler.expired(1.0) == []
+    assert scheduler.next_deadline() == 2.0  # Moved to the real deadline
+    assert scheduler.expired(1.9) == []
+    assert scheduler.expired(2.0) == [0x11]
+
+def test_earlier_deadline_leaves_a_stale_entry_that_is_skipped():
+    scheduler = DeadlineScheduler()
+    scheduler.arm(0x11, 5.0)
+    scheduler.arm(0x11, 2.0)   # Period got shorter: a second heap entry
+    assert len(scheduler.heap) == 2
+    assert scheduler.expired(2.0) == [0x11]
+    assert scheduler.expired(5.0) == []  # The entry at 5.0 is stale
+    assert scheduler.heap == []
+
+def test_rearm_after_firing_and_disarm():
+    scheduler = DeadlineScheduler()
+    scheduler.arm(0x11, 1.0)
+    assert scheduler.expired(1.0) == [0x11]
+    scheduler.arm(0x11, 3.0)   # Suspended ID keeps being evaluated
+    scheduler.arm(0x22, 2.0)
+    scheduler.disarm(0x22)
+    assert scheduler.expired(5.0) == [0x11]
@@ -0,0 +1,32 @@
+import numpy as np
+from detector_core import CIDS
+from detector_bank import DetectorBank
+from cids import IncrementalCIDS
+
+def arrivals(n=20000, seed=1, period=0.05, skew=2e-4, jitter=5e-5):
+    rng = np.random.default_rng(seed)
+    return np.cumsum(period * (1 + skew) + rng.uniform(-jitter, jitter, n)).tolist()
+
+def batch_results(detector, times):
+    results = [detector.add_frame(t) for t in times]
+    return np.array([r for r in results if r is not None])
+
+def test_incremental_matches_batches_within_rounding():
+    times = arrivals()
+    expected = batch_results(CIDS(), times)
+    incremental = batch_results(IncrementalCIDS(every=CIDS().batch_size), times)
+
+    # The running window sum is added up in another order: equal up to rounding only
+    assert incremental.shape == expected.shape
+    np.testing.assert_allclose(incremental, expected, rtol=1e-5, atol=1e-9)
+
+def test_bank_matches_scalar_core():
+    times = arrivals()
+    expected = batch_results(CIDS(), times)
+    bank = DetectorBank()
+    rows = []
+    for t in times:
+        bank.add_frame(0x11, t)
+        _, O_acc, error, L_plus, L_minus, _ = bank.tick()
+        rows.extend(zip(O_acc, error, L_plus, L_minus))
+    np.testing.assert_allclose(np.array(rows), expected, rtol=1e-9, atol=1e-12)
@@ -0,0 +1,62 @@
+import pytest
+from cids import make_registry, handle_frame, handle_deadlines, DeadlineScheduler
+from ecu_clusters import REASSIGN_Z, WARMUP_SECONDS
+from harness import RecordingTelemetry
+from traffic_generator import TrafficGenerator, Attack, random_ecus, JITTER
+
+def run_generator(seed, duration=600.0, attacks=()):
+    """Generator traffic (4 ECUs x 5 IDs) through the clustered detector"""
+    ecus = random_ecus(4, 5, seed)
+    registry = make_registry(ecu_clusters=True)
+    scheduler = DeadlineScheduler()
+    telemetry = RecordingTelemetry()
+    for t, msg in TrafficGenerator(ecus, attacks, seed).events(duration):
+        handle_frame(registry, scheduler, telemetry, msg.arbitration_id, t)
+        handle_deadlines(registry, scheduler, telemetry, t)
+    return registry, telemetry, ecus
+
+@pytest.mark.parametrize("seed", [1, 2, 3])
+def test_no_alarms_without_attack(seed):
+    duration = 600.0
+    registry, telemetry, ecus = run_generator(seed, duration)
+    assert telemetry.alarms() == []
+
+    # Assignment is provisional (ECUs a few ppm apart share a cluster until their fast IDs
+    # can tell them apart), but no ID stays in a cluster that its own estimate rules out
+    for ecu in ecus:
+        for arb_id in ecu["ids"]:
+            ids = registry.detectors[arb_id]
+            assert ids.cluster is not None
+            _, skew_var = ids.skew_estimate(duration - ids.start_time)
+            z = abs(ids.cluster.S - ecu["skew"] / 2) / (skew_var + ids.cluster.skew_var) ** 0.5
+            assert z < REASSIGN_Z + 1
+
+def test_masquerade_on_clustered_id():
+    registry, telemetry, _ = run_generator(1, 900.0, [Attack("masquerade", 0x100, 450.0)])
+    assert registry.detectors[0x100].cluster is not None
+    alarms = telemetry.alarms()
+    assert alarms and all(arb_id == 0x100 and now >= 450.0 for arb_id, now, _ in alarms)
+    assert alarms[0][2] == "Masquerade"
+
+def test_new_id_converges_faster_in_its_cluster():
+    skew, start = 1.2e-4, 300.0
+    ecus = [{"skew": skew, "jitter": JITTER, "ids": {0x100: 0.01, 0x101: 0.02, 0x102: 0.1, 0x103: 0.5, 0x110: 0.01}},
+            {"skew": -1.5e-4, "jitter": JITTER, "ids": {0x200: 0.02, 0x201: 0.1}}]
+    clustered = make_registry(ecu_clusters=True)
+    standalone = make_registry(ecu_clusters=True)
+    errors = {"clustered": [], "standalone": []}
+    sample = start + WARMUP_SECONDS + 10.0
+    for t, msg in TrafficGenerator(ecus, (), 7).events(start + 180.0):
+        arb_id = msg.arbitration_id
+        if arb_id == 0x110:
+            if t < start:
+                continue  # 0x110 only appears at start, when the other IDs of its ECU are clustered
+            standalone.get(arb_id).add_frame(t)
+        clustered.get(arb_id).add_frame(t)
+        if t >= sample:
+            sample += 10.0
+            for name, registry in (("clustered", clustered), ("standalone", standalone)):
+                errors[name].append(abs(registry.detectors[0x110].S - skew / 2))
+
+    assert clustered.detectors[0x110].cluster is clustered.detectors[0x100].cluster
+    assert sum(errors["clustered"]) < sum(errors["standalone"]) / 3
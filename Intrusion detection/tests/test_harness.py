@@ -0,0 +1,16 @@
+import os
+import subprocess
+import sys
+import pytest
+
+HARNESS = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "harness.py")
+
+# The harness scripts as CI runs them: the exit status says whether the attack
+# was detected, and only after it started
+@pytest.mark.parametrize("args", [[], ["--no-attack"], ["--prefilter"], ["--bank"]],
+                         ids=["default", "no-attack", "prefilter", "bank"])
+def test_harness_scenario(args):
+    result = subprocess.run([sys.executable, HARNESS, *args], cwd=os.path.dirname(HARNESS),
+                            capture_output=True, text=True, timeout=300)
+    assert result.returncode == 0, result.stdout + result.stderr
+    assert "As expected" in result.stdout
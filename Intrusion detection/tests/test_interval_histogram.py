@@ -0,0 +1,93 @@
+import random
+import numpy as np
+import pytest
+from detector_core import CIDS
+from cids import IncrementalCIDS
+from interval_histogram import IntervalHistogram, with_pmf, PMF_BASELINE, PMF_BASELINE_SECONDS
+from simulation_masquerade import masquerade_arrivals, DURATION_NORMAL, PMF_RANGE_MS, PMF_BINS
+
+PmfCIDS = with_pmf(CIDS)
+
+def test_histogram_matches_numpy():
+    values = np.random.default_rng(0).uniform(48.0, 52.0, 5000)
+    hist = IntervalHistogram(*PMF_RANGE_MS, PMF_BINS)
+    for value in values:
+        hist.add(value)
+    inside = values[(values >= PMF_RANGE_MS[0]) & (values < PMF_RANGE_MS[1])]
+    expected, _ = np.histogram(inside, bins=hist.edges, density=True)
+    np.testing.assert_allclose(hist.density(), expected)
+
+@pytest.mark.parametrize("seed", range(5))
+def test_figure_8_masquerade_is_flagged(seed):
+    ids = PmfCIDS()
+    first_alarm = None
+    for t, _, attacked in masquerade_arrivals(random.Random(seed)):
+        ids.add_frame(t)
+        if ids.pmf_alarm:
+            first_alarm = t
+            break
+    assert first_alarm is not None and first_alarm > DURATION_NORMAL
+
+def periodic(period, duration, seed=0, jitter=5e-5):
+    rng = random.Random(seed)
+    t, times = 0.0, []
+    while t < duration:
+        t += period + rng.uniform(-jitter, jitter)
+        times.append(t)
+    return times
+
+def test_baseline_is_limited_by_time():
+    ids = PmfCIDS()
+    for t in periodic(0.1, PMF_BASELINE_SECONDS + 20):
+        ids.add_frame(t)
+    # About 2,000 intervals of a 100 ms ID, far from PMF_BASELINE
+    assert ids.recent_pmf is not None
+    assert ids.baseline_pmf.total < 0.6 * PMF_BASELINE
+
+def test_flood_during_learning_is_not_learned():
+    ids = PmfCIDS()
+    # 2 ms flood on the same ID from 5 s to 15 s
+    times = periodic(0.05, 2 * PMF_BASELINE_SECONDS) + list(np.arange(5.0, 15.0, 0.002))
+    clean_before_flood = None
+    for now in sorted(times):
+        if now >= 5.0 and clean_before_flood is None:
+            clean_before_flood = ids.baseline_pmf.total
+        ids.add_frame(now)
+
+    # Neither the flood intervals nor the intervals while the ID is in alarm are learned
+    baseline = ids.baseline_pmf
+    assert baseline.counts[0] == 0 and baseline.counts[-1] == 0
+    assert baseline.total <= clean_before_flood + 1
+    assert not ids.pmf_alarm
+
+@pytest.mark.parametrize("detector_cls", [CIDS, IncrementalCIDS])
+def test_suspension_is_not_learned(detector_cls):
+    ids = with_pmf(detector_cls)()
+    times = periodic(0.05, PMF_BASELINE_SECONDS + 100)
+    for now in times:
+        ids.add_frame(now)
+    assert ids.recent_pmf is not None
+    ids.recent_pmf.since_decay = 0  # No halving during the rest of the test
+    recent = ids.recent_pmf.counts.copy()
+
+    # Silent for a second, then the padded suspension batch, then the ID is back
+    last = times[-1]
+    ids.process_suspension(last + 0.5)
+    assert np.array_equal(ids.recent_pmf.counts, recent)
+    assert ids.pmf_last_arrival is None
+    for now in periodic(0.05, 10.0, seed=1):
+        ids.add_frame(last + 1.0 + now)
+
+    # Only the real intervals after the suspension, all of them in range
+    added = ids.recent_pmf.counts.astype(np.int64) - recent
+    assert added[0] == 0 and added[-1] == 0
+    assert added.sum() == len(periodic(0.05, 10.0, seed=1)) - 1
+
+def test_baseline_is_learned_behind_the_prefilter():
+    from prefilter import with_prefilter
+    ids = with_prefilter(PmfCIDS)()
+    for now in periodic(0.05, 50.0):
+        ids.add_frame(now)
+    # Both wrappers track the last arrival, each in its own slot
+    assert ids.baseline_pmf.total > 900
+    assert ids.baseline_pmf.counts[0] == 0
@@ -0,0 +1,56 @@
+from cids import make_registry, handle_frame, handle_deadlines, DeadlineScheduler, SUSPENSION_TIMEOUT_PERIODS
+from harness import RecordingTelemetry
+from prefilter import GAP_PERIODS
+
+PERIOD = 0.05
+
+def run_loop(frames, end):
+    """The run_cids loop on a virtual clock: frames and expired deadlines in time order until end"""
+    registry = make_registry(prefilter=True)
+    scheduler = DeadlineScheduler()
+    telemetry = RecordingTelemetry()
+    frames = iter(frames)
+    next_frame = next(frames, None)
+    while True:
+        deadline = scheduler.next_deadline()
+        if next_frame is not None and (deadline is None or next_frame <= deadline):
+            now = next_frame
+            handle_frame(registry, scheduler, telemetry, 0x11, now)
+            next_frame = next(frames, None)
+        elif deadline is not None and deadline <= end:
+            now = deadline
+        else:
+            return registry.detectors[0x11], telemetry
+        handle_deadlines(registry, scheduler, telemetry, now)
+
+def periodic(start, end, period=PERIOD):
+    return [start + i * period for i in range(int(round((end - start) / period)))]
+
+def test_flood_is_flagged_within_a_few_frames():
+    frames = sorted(periodic(0.0, 20.0) + periodic(10.0, 12.0, 0.002))
+    _, telemetry = run_loop(frames, 20.0)
+    alarms = telemetry.alarms()
+    assert alarms and alarms[0][2] == "Flood"
+    assert 10.0 <= alarms[0][1] < 10.0 + 10 * 0.002
+
+def test_silent_id_raises_gap_without_another_frame():
+    last = periodic(0.0, 10.0)[-1]
+    ids, telemetry = run_loop(periodic(0.0, 10.0), 20.0)
+    alarms = telemetry.alarms()
+    # Raised from the deadline path GAP_PERIODS periods after the last frame, before the suspension
+    assert alarms[0][2] == "Gap"
+    assert abs(alarms[0][1] - (last + GAP_PERIODS * PERIOD)) < 0.01 * PERIOD
+    suspended = [now for _, now, _, _, _, suspended in telemetry.batches if suspended]
+    assert suspended and abs(suspended[0] - (last + SUSPENSION_TIMEOUT_PERIODS * PERIOD)) < 0.01 * PERIOD
+    assert ids.gap_alarm
+
+def test_gap_clears_when_the_id_is_back():
+    frames = periodic(0.0, 10.0) + periodic(10.3, 20.0)
+    ids, telemetry = run_loop(frames, 20.0)
+    gaps = [now for _, now, shift in telemetry.alarms() if shift == "Gap"]
+    assert gaps and all(9.9 < now < 10.3 for now in gaps)
+    assert not ids.gap_alarm
+
+def test_regular_traffic_raises_nothing():
+    _, telemetry = run_loop(periodic(0.0, 60.0), 60.0 - PERIOD)
+    assert telemetry.alarms() == []
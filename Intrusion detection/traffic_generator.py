@@ -0,0 +1,203 @@
+
+import argparse
+import heapq
+import random
+import time
+import can
+from bus_config import get_bus, add_bus_arguments, configure_from_args
+
+# Deterministic multi-ECU traffic generator. Every periodic ID is a stream driven
+# by the clock of its ECU (period * (1 + skew) + jitter, as in
+# simulation_masquerade.py), and all streams are merged through one heap ordered
+# by the next send time. Attacks are injected on a schedule.
+
+SKEW_NORMAL = 0.00020   # Same clock skews as simulation_masquerade.py
+SKEW_ATTACK = 0.00001
+JITTER = 0.00005        # 50us jitter
+FABRICATION_INTERVAL = 0.002
+PERIODS = (0.01, 0.02, 0.05, 0.1, 0.2, 0.5, 1.0)
+BURST_WINDOW = 0.0005   # Frames due within this window are sent back to back
+
+ATTACK_TYPES = ("fabrication", "suspension", "masquerade")
+
+class Attack:
+    """
+    fabrication: extra frames of target_id every `interval` seconds
+    suspension:  the target_id stream is silent
+    masquerade:  target_id is sent with the attacker's clock skew
+    All between start and end (None = until the end of the run).
+    """
+    def __init__(self, kind, target_id, start, end=None, interval=FABRICATION_INTERVAL, skew=SKEW_ATTACK):
+        if kind not in ATTACK_TYPES:
+            raise ValueError(f"Unknown attack type: {kind}")
+        self.kind = kind
+        self.target_id = target_id
+        self.start = start
+        self.end = end
+        self.interval = interval
+        self.skew = skew
+
+    def active(self, t):
+        return self.start <= t and (self.end is None or t < self.end)
+
+class Stream:
+    def __init__(self, arb_id, period, skew, jitter, data, start=0.0, end=None):
+        self.arb_id = arb_id
+        self.period = period
+        self.skew = skew
+        self.jitter = jitter
+        self.end = end
+        self.suspensions = []   # Attacks silencing this stream
+        self.masquerades = []   # Attacks replacing this stream's clock
+        self.next_time = start
+        self.msg = can.Message(arbitration_id=arb_id, data=data, is_extended_id=arb_id > 0x7FF)
+
+    def advance(self, rng, t):
+        skew = self.skew
+        for attack in self.masquerades:
+            if attack.active(t):
+                skew = attack.skew
+        self.next_time = t + self.period * (1 + skew) + rng.uniform(-self.jitter, self.jitter)
+
+    def silent(self, t):
+        return any(attack.active(t) for attack in self.suspensions)
+
+def random_ecus(n_ecus, ids_per_ecu, seed=0, first_id=0x100):
+    """Bus layout: n_ecus clocks with their own skew, each sending ids_per_ecu periodic IDs"""
+    rng = random.Random(seed)
+    ecus = []
+    arb_id = first_id
+    for _ in range(n_ecus):
+        skew = rng.uniform(-SKEW_NORMAL, SKEW_NORMAL)
+        ids = {}
+        for _ in range(ids_per_ecu):
+            ids[arb_id] = rng.choice(PERIODS)
+            arb_id += 1
+        ecus.append({"skew": skew, "jitter": JITTER, "ids": ids})
+    return ecus
+
+class TrafficGenerator:
+    """
+    ecus:    [{"skew": .., "jitter": .., "ids": {arb_id: period}}]
+    attacks: [Attack]
+    The same seed gives the same frame sequence.
+    """
+    def __init__(self, ecus, attacks=(), seed=0):
+        self.ecus = ecus
+        self.attacks = list(attacks)
+        self.seed = seed
+        self.sent = 0
+
+        # Suspension and masquerade act on a generated stream (fabrication may add a new ID)
+        arb_ids = {arb_id for ecu in ecus for arb_id in ecu["ids"]}
+        for attack in self.attacks:
+            if attack.kind != "fabrication" and attack.target_id not in arb_ids:
+                raise ValueError(f"{attack.kind} target 0x{attack.target_id:X} is not a generated ID")
+
+    def _streams(self, rng):
+        streams = []
+        by_id = {}
+        for ecu in self.ecus:
+            for arb_id, period in ecu["ids"].items():
+                stream = Stream(arb_id, period, ecu["skew"], ecu.get("jitter", JITTER), b'\xAA\xBB',
+                                start=rng.uniform(0, period))
+                streams.append(stream)
+                by_id[arb_id] = stream
+
+        for attack in self.attacks:
+            if attack.kind == "fabrication":
+                streams.append(Stream(attack.target_id, attack.interval, 0.0, 0.0, b'\xFF\xFF',
+                                      start=attack.start, end=attack.end))
+            elif attack.kind == "suspension":
+                by_id[attack.target_id].suspensions.append(attack)
+            elif attack.kind == "masquerade":
+                by_id[attack.target_id].masquerades.append(attack)
+        return streams
+
+    def events(self, duration):
+        """Yields (time, can.Message) in send order; the message object is reused per stream"""
+        rng = random.Random(self.seed)
+        streams = self._streams(rng)
+        heap = [(s.next_time, i) for i, s in enumerate(streams)]
+        heapq.heapify(heap)
+
+        while heap:
+            t, i = heap[0]
+            if t >= duration:
+                return
+            stream = streams[i]
+            if stream.end is not None and t >= stream.end:
+                heapq.heappop(heap)
+                continue
+            stream.advance(rng, t)
+            heapq.heapreplace(heap, (stream.next_time, i))
+            if not stream.silent(t):
+                yield t, stream.msg
+
+    def run(self, bus, duration, speed=1.0, burst_window=BURST_WINDOW):
+        """
+        Sends the traffic onto the bus. speed=1 is real time, speed=10 compresses
+        time tenfold (overload), speed=None sends as fast as possible.
+        Send times are taken from the schedule, so timing does not drift under load.
+        """
+        self.sent = 0
+        late = 0
+        start = time.perf_counter()
+
+        for t, msg in self.events(duration):
+            if speed:
+                # Lateness is measured on a fresh clock reading right before the send
+                due = start + t / speed
+                now = time.perf_counter()
+                if due > now + burst_window:
+                    time.sleep(due - now)
+                elif now - due > 0.01:
+                    late += 1
+            msg.timestamp = t
+            bus.send(msg)
+            self.sent += 1
+
+        elapsed = time.perf_counter() - start
+        rate = self.sent / elapsed if elapsed > 0 else 0.0
+        print(f"Sent {self.sent} frames in {elapsed:.2f}s ({rate:.0f} frames/s, {late} more than 10ms late)")
+        return self.sent
+
+def parse_attack(spec):
+    """kind:0xID:start[:end], e.g. fabrication:0x11:5 or suspension:0x120:60:90"""
+    parts = spec.split(":")
+    kind, target_id, start = parts[0], int(parts[1], 0), float(parts[2])
+    end = float(parts[3]) if len(parts) > 3 else None
+    return Attack(kind, target_id, start, end)
+
+def main():
+    parser = argparse.ArgumentParser(description="Multi-ECU CAN traffic generator")
+    parser.add_argument("--ecus", type=int, default=20)
+    parser.add_argument("--ids-per-ecu", type=int, default=15)
+    parser.add_argument("--duration", type=float, default=60.0)
+    parser.add_argument("--speed", type=float, default=1.0, help="time compression, 0 = as fast as possible")
+    parser.add_argument("--attack", action="append", type=parse_attack, default=[],
+                        help="kind:0xID:start[:end], kind is fabrication, suspension or masquerade")
+    parser.add_argument("--seed", type=int, default=0)
+    add_bus_arguments(parser)
+    args = parser.parse_args()
+    configure_from_args(args)
+
+    ecus = random_ecus(args.ecus, args.ids_per_ecu, args.seed)
+    try:
+        generator = TrafficGenerator(ecus, args.attack, args.seed)
+    except ValueError as e:
+        parser.error(str(e))
+    n_ids = sum(len(ecu["ids"]) for ecu in ecus)
+    nominal = sum(1 / p for ecu in ecus for p in ecu["ids"].values())
+    print(f"Generator Active. {args.ecus} ECUs, {n_ids} IDs, {nominal:.0f} frames/s nominal")
+
+    bus = get_bus()
+    try:
+        generator.run(bus, args.duration, args.speed or None)
+    except KeyboardInterrupt:
+        print("Generator stopped")
+    finally:
+        bus.shutdown()
+
+if __name__ == "__main__":
+    main()
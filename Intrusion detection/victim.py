@@ -1,25 +1,26 @@
-
 import time
 import can
 from bus_config import get_bus
 
+VICTIM_ID = 0x11
+VICTIM_INTERVAL = 0.05 # 50ms
+
+def victim_frames(start, interval=VICTIM_INTERVAL):
+    """Yields (send time, message) of the victim ECU from start on; the message object is reused"""
+    msg = can.Message(arbitration_id=VICTIM_ID, data=b'\xAA\xBB', is_extended_id=False)
+    next_time = start
+    while True:
+        yield next_time, msg
+        next_time += interval
+
 def run_victim():
     bus = get_bus()
     print("Victim Active. Sending ID 0x11 every 0.05s...")
-    
-    next_time = time.time()
-    interval = 0.05 # 50ms
 
-    while True:
-        now = time.time()
-        if now >= next_time:
-            msg = can.Message(arbitration_id=0x11, data=b'\xAA\xBB', is_extended_id=False)
-            bus.send(msg)
-            
-            
-            next_time += interval
-        
-        time.sleep(0.001)
+    for send_time, msg in victim_frames(time.time()):
+        while time.time() < send_time:
+            time.sleep(0.001)
+        bus.send(msg)
 
 if __name__ == "__main__":
-    run_victim()
\ No newline at end of file
+    run_victim()